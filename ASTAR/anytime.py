@@ -0,0 +1,102 @@
+import math
+import time
+import main
+from heapq import heapify, heappush, heappop
+from city import CityInfo
+from graph import GraphCity
+from heuristics import h3, g1
+
+
+def anytime_a_star(city_from, city_to, h=h3, g=g1, cities=None, deadline=None, epsilon=3.0, step=0.5):
+	'''
+	Anytime A* (ARA*) : a generator of better and better itineraries.
+	The first round is a weighted A* with the heuristic inflated by epsilon, which finds a route quickly. Every next
+	round lowers epsilon by step down to 1 (plain, optimal A*) and only goes through again the cities whose cost
+	improved since the last round (the inconsistent ones) instead of starting over.
+
+	Yields (city, cost, iterations, open cities, itinerary, bound) after every round that found a cheaper route or
+	a tighter bound, bound being a proof that cost
+	is at most bound times the optimal one (with an admissible heuristic). iterations count all the rounds.
+	Stops once the optimal route is found, or as soon as time.perf_counter() goes past deadline : a round that was
+	interrupted does not yield anything.
+	'''
+	if cities is None:
+		cities = city_from.graph if isinstance(city_from, GraphCity) else main.all_cities
+
+	best = {city_from: 0}
+	parents = {city_from: None}
+	frontiere = [(epsilon * h(city_from, city_to), 0, city_from)]
+	opened = {city_from}  # cities with a valid entry in frontiere
+	hist = set()
+	incons = set()  # cities improved after being visited in the current round
+	last = (math.inf, math.inf)
+	i = 0
+
+	while True:
+		# improve_path : weighted A* until nothing in frontiere can beat the cost of the destination
+		while frontiere and frontiere[0][0] < best.get(city_to, math.inf):
+			if deadline is not None and time.perf_counter() > deadline:
+				return
+
+			prio, cost, city = heappop(frontiere)
+			if city not in opened or cost != best[city]:  # stale entry
+				continue
+			opened.discard(city)
+
+			i += 1
+			hist.add(city)
+
+			for possible_destination in city.neighbours:
+				dest = cities[possible_destination]
+				cost_i = g(cost, city, dest)
+				if cost_i < best.get(dest, math.inf):
+					best[dest] = cost_i
+					parents[dest] = city
+					if dest in hist:
+						incons.add(dest)
+					else:
+						opened.add(dest)
+						heappush(frontiere, (cost_i + epsilon * h(dest, city_to), cost_i, dest))
+
+		if city_to not in best:  # destination can't be reached
+			return
+
+		# the route follows parents, which may be cheaper than best[city_to] when a city of it improved since : cost,
+		# the costs along the itinerary and bound are all those of that route
+		cost, itinerary = _itinerary(city_to, parents, g, h)
+		lower = min((best[c] + h(c, city_to) for c in opened | incons), default=cost)
+		bound = max(1, min(epsilon, cost / lower)) if lower > 0 else 1
+		if (cost, bound) < last:  # only what's new : a cheaper route or a tighter bound
+			last = (cost, bound)
+			yield city_to, cost, i, len(opened) + len(incons), itinerary, bound
+
+		if epsilon <= 1:
+			return
+
+		# next round : smaller epsilon, the inconsistent cities are opened again and every priority is updated
+		epsilon = max(1, epsilon - step)
+		opened |= incons
+		incons = set()
+		hist = set()
+		frontiere = [(best[c] + epsilon * h(c, city_to), best[c], c) for c in opened]
+		heapify(frontiere)
+
+
+def _itinerary(city_to, parents, g, h):
+	'''(cost, itinerary) of the route given by parents, its costs computed again with g from the source'''
+	chain = []
+	city_i = city_to
+	while city_i is not None:
+		chain.append(city_i)
+		city_i = parents[city_i]
+	chain.reverse()
+
+	final_iti = []
+	cost = 0
+	parent = None
+	for city in chain:
+		if parent is not None:
+			cost = g(cost, parent, city)
+		final_iti.append(CityInfo(prio=cost + h(city, city_to), cost=cost, city=city, parent=parent))
+		parent = city
+	return cost, iter(final_iti)
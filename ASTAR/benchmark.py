@@ -0,0 +1,235 @@
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+import tracemalloc
+from heapq import heappush, heappop
+import generator
+from graph import Graph, search, dijkstra, goal_table
+from landmarks import Landmarks
+from hierarchy import Hierarchy
+from main import a_star, h0, h1, h2, h3, h4, g1, g2, CityInfo
+
+
+def a_star_rebuild(city_from, city_to, cities, h=h3, g=g1):
+	'''Previous A* implementation, rebuilding the whole frontiere after every expansion. Kept as a reference.'''
+	frontiere = []
+	heappush(frontiere, CityInfo(prio=0, cost=0, city=city_from, parent=None))
+	hist = set()
+	i = 0
+	while frontiere:
+		i += 1
+		info = heappop(frontiere)
+		a_star_cost, cost, city, city_parent = info
+		hist.add(city)
+
+		if city == city_to:
+			return city, cost, i, len(frontiere)
+
+		for possible_destination in city.neighbours:
+			dest = cities[possible_destination]
+			if dest not in hist:
+				cost_i = g(cost, city, dest)
+				heappush(frontiere, CityInfo(prio=h(dest, city_to) + cost_i, cost=cost_i, city=dest, parent=city))
+
+		visited_cities = set()
+		new_frontiere = []
+		while frontiere:
+			recurring = heappop(frontiere)
+			if recurring.city not in visited_cities:
+				heappush(new_frontiere, recurring)
+				visited_cities.add(recurring.city)
+		frontiere = new_frontiere
+
+
+def timed(function, *args, **kwargs):
+	t0 = time.perf_counter()
+	result = function(*args, **kwargs)
+	return time.perf_counter() - t0, result
+
+
+def bench_frontiere(sizes):
+	'''
+	Compares the lazy deletion frontiere of a_star with the previous implementation on growing grids,
+	from one corner to the opposite one, as well as a_star on the compact graph store.
+	'''
+	print("{0:>8} {1:>10} {2:>10} {3:>10} {4:>10} {5:>8}".format('cities', 'rebuild', 'lazy', 'speedup', 'compact', 'cost'))
+	for size in sizes:
+		cities = generator.grid(size, size, jitter=3, seed=size)
+		start = cities['c0']
+		objective = cities['c{0}'.format(size * size - 1)]
+
+		t_old, (_, cost_old, _, _) = timed(a_star_rebuild, start, objective, cities)
+		t_new, (_, cost_new, _, _, _) = timed(a_star, start, objective, h3, g1, cities=cities)
+		graph = Graph.from_cities(cities)
+		t_csr, (_, cost_csr, _, _, _) = timed(a_star, graph[start.name], graph[objective.name], h3, g1)
+		assert math.isclose(cost_old, cost_new) and math.isclose(cost_new, cost_csr)
+
+		print("{0:>8} {1:>9.3f}s {2:>9.3f}s {3:>9.1f}x {4:>9.3f}s {5:>8}".format(
+			size * size, t_old, t_new, t_old / t_new, t_csr, cost_new))
+
+
+def bench_landmarks(sizes, count=8, queries=20):
+	'''
+	Compares the ALT heuristic with h3 on random queries over jittered grids : expanded cities and wall time,
+	summed over all queries. Preprocessing time is reported apart, it is paid once per graph.
+	'''
+	print("{0:>8} {1:>10} {2:>10} {3:>10} {4:>10} {5:>10}".format(
+		'cities', 'preprocess', 'h3 exp', 'alt exp', 'h3 time', 'alt time'))
+	for size in sizes:
+		graph = Graph.from_cities(generator.grid(size, size, jitter=3, seed=size))
+		t_pre, alt = timed(Landmarks.build, graph, count, seed=size)
+
+		rand = random.Random(size)
+		pairs = [(rand.randrange(len(graph)), rand.randrange(len(graph))) for _ in range(queries)]
+		totals = {}
+		for h in (h3, alt):
+			expanded = 0
+			t0 = time.perf_counter()
+			for src, dst in pairs:
+				expanded += search(graph, src, dst, h, g1)[2]
+			totals[h] = expanded, time.perf_counter() - t0
+
+		print("{0:>8} {1:>9.2f}s {2:>10} {3:>10} {4:>9.3f}s {5:>9.3f}s".format(
+			len(graph), t_pre, totals[h3][0], totals[alt][0], totals[h3][1], totals[alt][1]))
+
+
+def bench_hierarchy(sizes, queries=100):
+	'''
+	Compares contraction hierarchies queries with a_star (h3, compact store) on random queries over jittered grids.
+	The hierarchy is saved next to the benchmark (ch-<size>.bin) and loaded again on the next runs, as the
+	preprocessing is meant to be paid once per graph.
+	'''
+	print("{0:>8} {1:>10} {2:>10} {3:>10} {4:>10} {5:>10} {6:>10}".format(
+		'cities', 'preprocess', 'shortcuts', 'a* exp', 'ch exp', 'a* query', 'ch query'))
+	for size in sizes:
+		graph = Graph.from_cities(generator.grid(size, size, jitter=3, seed=size))
+		filename = 'ch-{0}.bin'.format(size)
+		if os.path.exists(filename):
+			t_pre, ch = timed(Hierarchy.load, filename, graph)
+		else:
+			t_pre, ch = timed(Hierarchy.build, graph)
+			ch.save(filename)
+
+		rand = random.Random(size)
+		pairs = [(rand.randrange(len(graph)), rand.randrange(len(graph))) for _ in range(queries)]
+		totals = []
+		for run in (lambda src, dst: search(graph, src, dst, h3, g1), ch.query):
+			expanded = 0
+			costs = []
+			t0 = time.perf_counter()
+			for src, dst in pairs:
+				result = run(src, dst)
+				expanded += result[2]
+				costs.append(result[1])
+			totals.append((expanded / queries, (time.perf_counter() - t0) / queries, costs))
+		assert all(math.isclose(a, b) for a, b in zip(totals[0][2], totals[1][2]))
+
+		print("{0:>8} {1:>9.2f}s {2:>10} {3:>10.0f} {4:>10.0f} {5:>8.2f}ms {6:>8.2f}ms".format(
+			len(graph), t_pre, len(ch.targets) - graph.num_edges // 2, totals[0][0], totals[1][0],
+			totals[0][1] * 1000, totals[1][1] * 1000))
+
+
+def bench_table(sizes, queries=20, block=4096):
+	'''
+	Cost of an expansion with h3 evaluated on every push (heuristic_of) against a goal table computed for the query,
+	whole or by lazy blocks (see goal_table), on random queries over jittered grids. Time per expansion includes
+	building the table. Expanded cities and costs are the same for all three.
+	'''
+	print("{0:>8} {1:>10} {2:>12} {3:>12} {4:>12} {5:>12}".format(
+		'cities', 'expanded', 'h3 /exp', 'table /exp', 'blocks /exp', 'table build'))
+	for size in sizes:
+		graph = Graph.from_cities(generator.grid(size, size, jitter=3, seed=size))
+		rand = random.Random(size)
+		pairs = [(rand.randrange(len(graph)), rand.randrange(len(graph))) for _ in range(queries)]
+
+		results = []
+		for table in (False, True, block):
+			expanded = 0
+			costs = []
+			t0 = time.perf_counter()
+			for src, dst in pairs:
+				result = search(graph, src, dst, h3, g1, table=table)
+				expanded += result[2]
+				costs.append(result[1])
+			results.append((time.perf_counter() - t0, expanded, costs))
+		assert results[0][1:] == results[1][1:] == results[2][1:]
+
+		t_build = timed(goal_table, graph, h3, 0)[0]
+		expanded = results[0][1]
+		print("{0:>8} {1:>10} {2:>10.2f}us {3:>10.2f}us {4:>10.2f}us {5:>10.2f}ms".format(
+			len(graph), expanded // queries, *(elapsed / expanded * 1e6 for elapsed, _, _ in results), t_build * 1000))
+
+
+def bench_heuristics(sizes, topologies, queries=20, output=sys.stdout):
+	'''
+	Runs a_star (compact store) with every heuristic h0 - h4 and both cost functions g1 / g2 on the same random
+	queries, for every generated topology and size (number of cities). Every (topology, size, h, g) gives one JSON
+	line with the mean wall time, expanded cities and final cost per query, the biggest frontiere and the peak
+	memory of a query (measured on a second run with tracemalloc, as it slows everything down).
+	'''
+	heuristics = (h0, h1, h2, h3, h4)
+	for topology in topologies:
+		for size in sizes:
+			graph = Graph.from_cities(generator.TOPOLOGIES[topology](size, size))
+
+			# queries between cities of the same component, geometric graphs may not be connected
+			rand = random.Random(size)
+			root = rand.randrange(len(graph))
+			reachable = [i for i, cost in enumerate(dijkstra(graph, root)) if cost < math.inf]
+			pairs = [(rand.choice(reachable), rand.choice(reachable)) for _ in range(queries)]
+
+			for g in (g1, g2):
+				for h in heuristics:
+					elapsed = 0
+					expanded = 0
+					total_cost = 0
+					max_frontiere = 0
+					for src, dst in pairs:
+						t0 = time.perf_counter()
+						result = search(graph, src, dst, h, g, stats=True)
+						elapsed += time.perf_counter() - t0
+						expanded += result[2]
+						total_cost += result[1]
+						max_frontiere = max(max_frontiere, result[5].max_frontiere)
+
+					peak_memory = 0
+					for src, dst in pairs:
+						tracemalloc.start()
+						search(graph, src, dst, h, g)
+						peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+						tracemalloc.stop()
+
+					output.write(json.dumps({
+						'topology': topology, 'cities': len(graph), 'connections': graph.num_edges // 2,
+						'h': h.__name__, 'g': g.__name__, 'queries': queries,
+						'time': elapsed / queries, 'expanded': expanded / queries, 'cost': total_cost / queries,
+						'max_frontiere': max_frontiere, 'peak_memory': peak_memory}) + '\n')
+					output.flush()
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='A* benchmarks on generated grids')
+	parser.add_argument('bench', choices=['frontiere', 'landmarks', 'hierarchy', 'heuristics', 'table'])
+	parser.add_argument('sizes', nargs='*', type=int,
+		help='grid sides (the grids have size * size cities), number of cities for heuristics')
+	parser.add_argument('--topology', action='append', choices=sorted(generator.TOPOLOGIES),
+		help='generated topologies for heuristics, all of them by default')
+	parser.add_argument('--queries', default=20, type=int)
+	parser.add_argument('--output', default=None, help='JSON lines file for heuristics, stdout by default')
+	args = parser.parse_args()
+
+	if args.bench == 'frontiere':
+		bench_frontiere(args.sizes or [20, 40, 80])
+	elif args.bench == 'landmarks':
+		bench_landmarks(args.sizes or [100, 200, 300])
+	elif args.bench == 'hierarchy':
+		bench_hierarchy(args.sizes or [100, 320])
+	elif args.bench == 'table':
+		bench_table(args.sizes or [100, 300, 1000], args.queries)
+	elif args.bench == 'heuristics':
+		output = open(args.output, 'a') if args.output else sys.stdout
+		bench_heuristics(args.sizes or [10000, 100000], args.topology or sorted(generator.TOPOLOGIES), args.queries, output)
@@ -0,0 +1,139 @@
+from collections import OrderedDict
+from city import City, CityInfo
+from heuristics import h0, h1, h2, h3, g1, g2
+from main import a_star
+
+
+class RouteCache:
+	'''
+	Memoizing cache in front of a_star, with LRU eviction.
+	Results are indexed by (city_from, city_to, h, g), the oldest one being dropped once maxsize is reached.
+	Every cached route is also indexed by the cities it goes through : any part of an optimal itinerary is itself
+	an optimal itinerary, so a query between two cities of a cached route is answered without searching.
+	This is only done for (h, g) pairs that give optimal itineraries (see optimal).
+	Other a_star options (bidirectional, table, cities...) are part of the key, and their routes are not reused for
+	other queries. observer, verbose and debug only apply on a miss, stats=True is refused (hits have no SearchStats)
+	and queries with an option that can't be hashed (a cities dict) go straight to a_star.
+	The whole cache is dropped as soon as City.add_connection changes the graph.
+	'''
+
+	def __init__(self, maxsize=1024, search=a_star, reuse_subpaths=True):
+		self.maxsize = maxsize
+		self.search = search
+		self.reuse_subpaths = reuse_subpaths
+		self.hits = 0
+		self.subpath_hits = 0
+		self.misses = 0
+		self._routes = OrderedDict()
+		self._through = {}  # (h, g, city) -> {key: position of city in the route of key}
+		self._version = City.version
+
+	def route(self, city_from, city_to, h=h3, g=g1, **kwargs):
+		'''Same as a_star (extra kwargs are given to it on a miss)'''
+		if self._version != City.version:
+			self.clear()
+			self._version = City.version
+
+		if kwargs.get('stats', False):
+			raise ValueError('RouteCache results have no SearchStats, use a_star(..., stats=True)')
+		options = tuple(sorted((name, value) for name, value in kwargs.items()
+			if name not in _untracked and value is not None and value is not False))
+		try:
+			hash(options)
+		except TypeError:
+			self.misses += 1
+			return _result(_keep(self.search(city_from, city_to, h, g, **kwargs)))
+
+		key = (city_from, city_to, h, g) + options
+		if key in self._routes:
+			self._routes.move_to_end(key)
+			self.hits += 1
+			return _result(self._routes[key])
+
+		if self.reuse_subpaths and not options and optimal(h, g):
+			found = self._subpath(city_from, city_to, h, g)
+			if found is not None:
+				self.hits += 1
+				self.subpath_hits += 1
+				return found
+
+		self.misses += 1
+		result = _keep(self.search(city_from, city_to, h, g, **kwargs))
+		self._store(key, result)
+		return _result(result)
+
+	def _store(self, key, result):
+		self._routes[key] = result
+		if result is not None and self.reuse_subpaths and len(key) == 4 and optimal(key[2], key[3]):
+			for position, info in enumerate(result[4]):
+				self._through.setdefault((key[2], key[3], info.city), {})[key] = position
+
+		while len(self._routes) > self.maxsize:
+			old_key, old = self._routes.popitem(last=False)
+			if old is not None:
+				for info in old[4]:
+					through = self._through.get((old_key[2], old_key[3], info.city))
+					if through is not None:
+						through.pop(old_key, None)
+						if not through:
+							del self._through[(old_key[2], old_key[3], info.city)]
+
+	def _subpath(self, city_from, city_to, h, g):
+		'''Looks for a cached route going through city_from then city_to'''
+		starts = self._through.get((h, g, city_from))
+		ends = self._through.get((h, g, city_to))
+		if not starts or not ends:
+			return None
+
+		for key, begin in starts.items():
+			end = ends.get(key)
+			if end is not None and end >= begin:
+				self._routes.move_to_end(key)
+				steps = self._routes[key][4][begin:end + 1]
+				base = steps[0].cost
+				final_iti = []
+				for j, info in enumerate(steps):
+					cost = info.cost - base
+					final_iti.append(CityInfo(
+						prio=cost + h(info.city, city_to), cost=cost, city=info.city, parent=info.parent if j else None))
+				return city_to, final_iti[-1].cost, 0, 0, iter(final_iti)
+		return None
+
+	def clear(self):
+		self._routes.clear()
+		self._through.clear()
+
+	def __len__(self):
+		return len(self._routes)
+
+
+def optimal(h, g):
+	'''
+	True if a_star is known to give optimal itineraries with this heuristic and cost : consistent heuristics
+	with the travel distance (landmarks included), or no heuristic at all with the number of cities.
+	'''
+	if g is g1:
+		return h in (h0, h1, h2, h3) or hasattr(h, 'for_target')
+	if g is g2:
+		return h is h0
+	return False
+
+
+# a_star options that don't change the route
+_untracked = ('observer', 'verbose', 'debug', 'stats')
+
+
+def _keep(result):
+	'''Result of a search as it is cached, with its itinerary as a list'''
+	if result is None:
+		return None
+	dest, cost, iterations, opened, itinerary = result[:5]
+	return dest, cost, iterations, opened, list(itinerary)
+
+
+def _result(result):
+	'''Cached results keep their itinerary as a list, every caller gets its own iterator like a_star returns'''
+	if result is None:
+		return None
+	dest, cost, iterations, opened, itinerary = result
+	return dest, cost, iterations, opened, iter(itinerary)
@@ -1,6 +1,16 @@
+from collections import namedtuple
+
+# search tree entries (frontiere and itineraries), ordered by priority (heuristic + cost) first
+CityInfo = namedtuple('city_info', 'prio cost city parent')
+
+
 
 
 class City:
+	# incremented every time a connection is added or its distance changes, so that route caches know when
+	# their itineraries may be outdated
+	version = 0
+
 	def __init__(self, id, name, pos_x, pos_y):
 		self.id = id
 		self.name = name
@@ -9,6 +19,8 @@ class City:
 		self.neighbours = {}
 
 	def add_connection(self, neighbour, distance):
+		if self.neighbours.get(neighbour) != distance:
+			City.version += 1
 		self.neighbours[neighbour] = distance
 
 	def __str__(self):
@@ -0,0 +1,161 @@
+import sys
+import math
+import random
+from city import City
+
+
+def road_cost(city1, city2):
+	'''Integer road length between two cities, never shorter than the crow flies so h3 stays admissible'''
+	return int(math.ceil(math.sqrt((city1.x - city2.x) ** 2 + (city1.y - city2.y) ** 2)))
+
+
+def connect(city1, city2):
+	cost = road_cost(city1, city2)
+	city1.add_connection(city2.name, cost)
+	city2.add_connection(city1.name, cost)
+
+
+def grid(width, height, spacing=10, jitter=0, seed=None):
+	'''
+	Road-like grid graph of width * height cities, every city being connected to its 4 direct neighbours.
+	Cities are moved by up to jitter units on each axis so that ties are less frequent.
+	Returns a dict of cities indexed by name, like all_cities.
+	'''
+	rand = random.Random(seed)
+	cities = {}
+	rows = []
+	count = 0
+	for j in range(height):
+		row = []
+		for i in range(width):
+			name = 'c{0}'.format(count)
+			x = i * spacing + rand.randint(-jitter, jitter)
+			y = j * spacing + rand.randint(-jitter, jitter)
+			city = City(count, name, x, y)
+			cities[name] = city
+			row.append(city)
+			count += 1
+		rows.append(row)
+
+	for j in range(height):
+		for i in range(width):
+			if i > 0:
+				connect(rows[j][i - 1], rows[j][i])
+			if j > 0:
+				connect(rows[j - 1][i], rows[j][i])
+
+	return cities
+
+
+def _random_cities(num_cities, size, rand):
+	cities = {}
+	for count in range(num_cities):
+		name = 'c{0}'.format(count)
+		cities[name] = City(count, name, rand.randint(0, size), rand.randint(0, size))
+	return cities
+
+
+def _buckets(cities, cell):
+	'''Cities grouped by square cells of side cell, to only compare cities that are close to each other'''
+	buckets = {}
+	for city in cities.values():
+		buckets.setdefault((city.x // cell, city.y // cell), []).append(city)
+	return buckets
+
+
+def random_geometric(num_cities, degree=6, size=None, seed=None):
+	'''
+	Random geometric graph : cities are scattered uniformly and every pair closer than a radius is connected.
+	The radius is chosen so that cities have degree connections on average. The graph may not be connected.
+	'''
+	rand = random.Random(seed)
+	if size is None:
+		size = int(10 * math.sqrt(num_cities))
+	cities = _random_cities(num_cities, size, rand)
+	radius = math.sqrt(degree * size * size / (math.pi * num_cities))
+	cell = max(1, int(math.ceil(radius)))
+	buckets = _buckets(cities, cell)
+
+	for (bx, by), bucket in buckets.items():
+		for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):  # every pair of cells once
+			other = buckets.get((bx + dx, by + dy))
+			if other is None:
+				continue
+			for i, city1 in enumerate(bucket):
+				for city2 in (bucket[i + 1:] if (dx, dy) == (0, 0) else other):
+					if (city1.x - city2.x) ** 2 + (city1.y - city2.y) ** 2 <= radius * radius:
+						connect(city1, city2)
+
+	return cities
+
+
+def delaunay_like(num_cities, sectors=6, size=None, seed=None, max_rings=4):
+	'''
+	Sparse planar-like graph close to a Delaunay triangulation (Yao graph) : the plane around every city is split
+	in sectors angular sectors and the city is connected to its closest neighbour in each of them.
+	Sectors with no city within max_rings cells (on the borders of the map) are left empty.
+	Cheap to build, with a degree close to the one of a real road network.
+	'''
+	rand = random.Random(seed)
+	if size is None:
+		size = int(10 * math.sqrt(num_cities))
+	cities = _random_cities(num_cities, size, rand)
+	cell = max(1, size // max(1, int(math.sqrt(num_cities / 2))))  # about 2 cities per cell
+	buckets = _buckets(cities, cell)
+
+	for city in cities.values():
+		cx, cy = city.x // cell, city.y // cell
+		closest = [None] * sectors
+		found = 0
+		ring = 0
+		# look around in growing rings of cells until every sector has its neighbour and nothing else can be closer
+		while found < sectors and ring <= max_rings:
+			for bx in range(cx - ring, cx + ring + 1):
+				for by in range(cy - ring, cy + ring + 1):
+					if max(abs(bx - cx), abs(by - cy)) != ring:
+						continue
+					for other in buckets.get((bx, by), ()):
+						if other is city or (other.x == city.x and other.y == city.y):
+							continue
+						dist = (other.x - city.x) ** 2 + (other.y - city.y) ** 2
+						angle = math.atan2(other.y - city.y, other.x - city.x) % (2 * math.pi)
+						sector = int(angle / (2 * math.pi) * sectors) % sectors
+						if closest[sector] is None or dist < closest[sector][0]:
+							closest[sector] = (dist, other)
+			# a city further than ring * cell might still beat what was found, stop one ring later
+			found = sum(1 for c in closest if c is not None and c[0] <= (ring * cell) ** 2)
+			ring += 1
+
+		for c in closest:
+			if c is not None:
+				connect(city, c[1])
+
+	return cities
+
+
+def write(cities, positions, connections):
+	'''Writes cities to a positions file and a connections file, in the format load_cities reads'''
+	with open(positions, 'w') as f:
+		for city in sorted(cities.values()):
+			f.write('{0} {1} {2}\n'.format(city.name, city.x, city.y))
+	with open(connections, 'w') as f:
+		for city in sorted(cities.values()):
+			for name, cost in city.neighbours.items():
+				if cities[name].id > city.id:  # connections are two ways, write them once
+					f.write('{0} {1} {2}\n'.format(city.name, name, cost))
+
+
+TOPOLOGIES = {
+	'grid': lambda num_cities, seed: grid(int(math.sqrt(num_cities)), int(math.sqrt(num_cities)), jitter=3, seed=seed),
+	'geometric': lambda num_cities, seed: random_geometric(num_cities, seed=seed),
+	'delaunay': lambda num_cities, seed: delaunay_like(num_cities, seed=seed),
+}
+
+
+if __name__ == '__main__':
+	'''
+	Usage: generator.py grid|geometric|delaunay <number of cities> positions.txt connections.txt [seed]
+	'''
+	topology, num_cities, positions, connections = sys.argv[1:5]
+	seed = int(sys.argv[5]) if len(sys.argv) > 5 else None
+	write(TOPOLOGIES[topology](int(num_cities), seed), positions, connections)
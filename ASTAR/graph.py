@@ -0,0 +1,342 @@
+import csv
+import math
+from array import array
+from collections.abc import Mapping
+from heapq import heappush, heappop
+from city import City, CityInfo
+from heuristics import h0, h1, h2, h3, h4, g0, g1, g2
+from instrument import SearchStats
+
+try:
+	import numpy
+except ImportError:  # goal tables are then computed in pure Python
+	numpy = None
+
+
+class Graph(Mapping):
+	'''
+	Compact graph store.
+	Every city gets a dense integer id, coordinates are kept in flat arrays and adjacency in CSR form :
+	the neighbours of city i are targets[offsets[i]:offsets[i + 1]], with the matching weights.
+	The graph is also a read-only mapping of names to City views, so it can be used anywhere all_cities is.
+	'''
+
+	def __init__(self, names, xs, ys, offsets, targets, weights):
+		self.names = names
+		self.xs = xs
+		self.ys = ys
+		self.offsets = offsets
+		self.targets = targets
+		self.weights = weights
+		self._index = None
+
+	@classmethod
+	def from_edges(cls, names, xs, ys, sources, destinations, costs):
+		'''Builds the CSR arrays from a list of directed edges, with a counting sort on the source id'''
+		num_cities = len(names)
+		offsets = array('q', bytes(8 * (num_cities + 1)))
+		for src in sources:
+			offsets[src + 1] += 1
+		for i in range(num_cities):
+			offsets[i + 1] += offsets[i]
+
+		num_edges = len(sources)
+		targets = array('i', bytes(4 * num_edges))
+		weights = array('d', bytes(8 * num_edges))
+		fill = array('q', offsets[:-1])
+		for src, dst, cost in zip(sources, destinations, costs):
+			pos = fill[src]
+			targets[pos] = dst
+			weights[pos] = cost
+			fill[src] = pos + 1
+
+		return cls(names, xs, ys, offsets, targets, weights)
+
+	@classmethod
+	def from_cities(cls, cities):
+		'''Builds a Graph from a dict of City objects indexed by name, like all_cities'''
+		ordered = sorted(cities.values())
+		names = [city.name for city in ordered]
+		ids = {name: i for i, name in enumerate(names)}
+		xs = array('d', (city.x for city in ordered))
+		ys = array('d', (city.y for city in ordered))
+		sources, destinations, costs = array('i'), array('i'), array('d')
+		for i, city in enumerate(ordered):
+			for name, cost in city.neighbours.items():
+				sources.append(i)
+				destinations.append(ids[name])
+				costs.append(cost)
+
+		return cls.from_edges(names, xs, ys, sources, destinations, costs)
+
+	@classmethod
+	def from_files(cls, positions, connections):
+		'''Same as load_cities but straight into the compact store, without creating any City object'''
+		names = []
+		ids = {}
+		xs, ys = array('d'), array('d')
+		with open(positions, newline='') as f:
+			for name, x, y in csv.reader(f, delimiter=" "):
+				ids[name] = len(names)
+				names.append(name)
+				xs.append(int(x))
+				ys.append(int(y))
+
+		sources, destinations, costs = array('i'), array('i'), array('d')
+		with open(connections, newline='') as f:
+			for src, dst, cost in csv.reader(f, delimiter=" "):
+				src, dst, cost = ids[src], ids[dst], int(cost)
+				# connections are two ways
+				sources.append(src)
+				destinations.append(dst)
+				costs.append(cost)
+				sources.append(dst)
+				destinations.append(src)
+				costs.append(cost)
+
+		graph = cls.from_edges(names, xs, ys, sources, destinations, costs)
+		graph._index = ids
+		return graph
+
+	@property
+	def index(self):
+		'''
+		City ids indexed by name. Unless the graph came with one (text files, binary graph file with an order
+		section), a dict is built when a name is first looked up, which goes through every name once.
+		'''
+		if self._index is None:
+			self._index = {name: i for i, name in enumerate(self.names)}
+		return self._index
+
+	@property
+	def num_edges(self):
+		return len(self.targets)
+
+	def city(self, id):
+		return GraphCity(self, id)
+
+	def neighbours(self, id):
+		'''(neighbour id, weight) pairs of a city'''
+		begin, end = self.offsets[id], self.offsets[id + 1]
+		return zip(self.targets[begin:end], self.weights[begin:end])
+
+	def __getitem__(self, name):
+		return GraphCity(self, self.index[name])
+
+	def __contains__(self, name):
+		return name in self.index
+
+	def __iter__(self):
+		return iter(self.names)
+
+	def __len__(self):
+		return len(self.offsets) - 1
+
+
+class GraphCity(City):
+	'''Thin City view over a Graph : it only holds the graph and the city id, everything else is read from the arrays'''
+
+	def __init__(self, graph, id):
+		self.graph = graph
+		self.id = id
+
+	@property
+	def name(self):
+		return self.graph.names[self.id]
+
+	@property
+	def x(self):
+		return self.graph.xs[self.id]
+
+	@property
+	def y(self):
+		return self.graph.ys[self.id]
+
+	@property
+	def neighbours(self):
+		names = self.graph.names
+		return {names[dst]: cost for dst, cost in self.graph.neighbours(self.id)}
+
+	def add_connection(self, neighbour, distance):
+		raise TypeError('Graph is read-only, connections must be added before building it')
+
+
+def heuristic_of(graph, h, target):
+	'''Returns the heuristic h towards target as a function of a city id'''
+	xs, ys = graph.xs, graph.ys
+	tx, ty = xs[target], ys[target]
+	if h is h0:
+		return lambda i: 0
+	if h is h1:
+		return lambda i: abs(xs[i] - tx)
+	if h is h2:
+		return lambda i: abs(ys[i] - ty)
+	if h is h3:
+		return lambda i: math.sqrt((xs[i] - tx) ** 2 + (ys[i] - ty) ** 2)
+	if h is h4:
+		return lambda i: abs(xs[i] - tx) + abs(ys[i] - ty)
+
+	# heuristics backed by preprocessed tables (landmarks) know how to work on ids themselves
+	for_target = getattr(h, 'for_target', None)
+	if for_target is not None:
+		return for_target(target)
+
+	# any other heuristic gets City views
+	destination = graph.city(target)
+	return lambda i: h(graph.city(i), destination)
+
+
+def goal_table(graph, h, target, block=None):
+	'''
+	Heuristic h towards target for every city at once, as a function of a city id that only reads an array.
+	The whole table is computed up front (with NumPy over the coordinate arrays when it is installed), or with a
+	block size, lazily by blocks of ids the first time one of them is looked up, for graphs too big to fill a
+	table per query. Only h0 - h4 have a table, other heuristics are given back by heuristic_of.
+	'''
+	if h not in (h0, h1, h2, h3, h4):
+		return heuristic_of(graph, h, target)
+
+	if block is None or block >= len(graph):
+		return _goal_block(graph, h, target, 0, len(graph)).__getitem__
+
+	blocks = [None] * (-(-len(graph) // block))
+
+	def lookup(i):
+		values = blocks[i // block]
+		if values is None:
+			start = i - i % block
+			values = blocks[i // block] = _goal_block(graph, h, target, start, min(start + block, len(graph)))
+		return values[i % block]
+
+	return lookup
+
+
+def _goal_block(graph, h, target, start, stop):
+	'''array('d') of h towards target for the ids from start to stop'''
+	tx, ty = graph.xs[target], graph.ys[target]
+	if numpy is not None:
+		dx = numpy.frombuffer(graph.xs, numpy.float64)[start:stop] - tx
+		dy = numpy.frombuffer(graph.ys, numpy.float64)[start:stop] - ty
+		if h is h0:
+			values = numpy.zeros(stop - start)
+		elif h is h1:
+			values = numpy.abs(dx)
+		elif h is h2:
+			values = numpy.abs(dy)
+		elif h is h3:
+			values = numpy.sqrt(dx * dx + dy * dy)
+		else:
+			values = numpy.abs(dx) + numpy.abs(dy)
+		table = array('d')
+		table.frombytes(values.tobytes())
+		return table
+
+	heuristic = heuristic_of(graph, h, target)
+	return array('d', (heuristic(i) for i in range(start, stop)))
+
+
+def cost_of(graph, g):
+	'''Returns the cost function g as a function of (base cost, city id, neighbour id, edge weight)'''
+	if g is g0:
+		return lambda base_cost, src, dst, weight: 0
+	if g is g1:
+		return lambda base_cost, src, dst, weight: base_cost + weight
+	if g is g2:
+		return lambda base_cost, src, dst, weight: base_cost + 1
+
+	return lambda base_cost, src, dst, weight: g(base_cost, graph.city(src), graph.city(dst))
+
+
+def search(graph, source, target, h=h3, g=g1, observer=None, stats=False, table=False):
+	'''
+	A* on the compact store, from and to city ids.
+	Same algorithm and same result as a_star : (city, cost, iterations, open cities, itinerary), followed by the
+	SearchStats with stats=True. The observer gets city ids, not City views.
+	With table=True, the heuristic is read from a goal table computed once for the query (see goal_table), an
+	integer gives the block size of a lazy one.
+	'''
+	if table:
+		heuristic = goal_table(graph, h, target, None if table is True else table)
+	else:
+		heuristic = heuristic_of(graph, h, target)
+	cost_fn = cost_of(graph, g)
+	offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+
+	frontiere = [(0, 0, source)]
+	best = {source: 0}
+	parents = {source: None}
+	hist = set()
+
+	i = 0
+	pushes, pops, stale, relaxations, max_frontiere = 1, 0, 0, 0, 1
+	while frontiere:
+		prio, cost, city = heappop(frontiere)
+		pops += 1
+		if city in hist:  # stale entry
+			stale += 1
+			if observer is not None:
+				observer.on_stale(city)
+			continue
+
+		i += 1
+		hist.add(city)
+
+		if city == target:
+			open_cities = len(best) - len(hist)
+			final_iti = []
+			city_i = city
+			while city_i is not None:
+				parent = parents[city_i]
+				final_iti.append(CityInfo(
+					prio=best[city_i] + heuristic(city_i) if city_i != source else 0,
+					cost=best[city_i],
+					city=graph.city(city_i),
+					parent=graph.city(parent) if parent is not None else None))
+				city_i = parent
+
+			final = (graph.city(city), cost, i, open_cities, reversed(final_iti))
+			search_stats = SearchStats(i, pushes, pops, stale, relaxations, max_frontiere)
+			if observer is not None:
+				observer.on_finish(search_stats)
+			return final + (search_stats,) if stats else final
+
+		for e in range(offsets[city], offsets[city + 1]):
+			dest = targets[e]
+			if dest not in hist:
+				relaxations += 1
+				cost_i = cost_fn(cost, city, dest, weights[e])
+				if cost_i < best.get(dest, math.inf):
+					best[dest] = cost_i
+					parents[dest] = city
+					prio_i = heuristic(dest) + cost_i
+					heappush(frontiere, (prio_i, cost_i, dest))
+					pushes += 1
+					if observer is not None:
+						observer.on_push(dest, cost_i, prio_i)
+
+		if len(frontiere) > max_frontiere:
+			max_frontiere = len(frontiere)
+		if observer is not None:
+			observer.on_expand(city, cost, frontiere, hist)
+
+	if observer is not None:
+		observer.on_finish(SearchStats(i, pushes, pops, stale, relaxations, max_frontiere))
+
+
+def dijkstra(graph, source):
+	'''Single source shortest paths (edge weights as cost), returns the distance to every city (inf if unreachable)'''
+	offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+	dist = array('d', [math.inf]) * len(graph)
+	dist[source] = 0
+	frontiere = [(0, source)]
+	while frontiere:
+		cost, city = heappop(frontiere)
+		if cost > dist[city]:  # stale entry
+			continue
+		for e in range(offsets[city], offsets[city + 1]):
+			dest = targets[e]
+			cost_i = cost + weights[e]
+			if cost_i < dist[dest]:
+				dist[dest] = cost_i
+				heappush(frontiere, (cost_i, dest))
+	return dist
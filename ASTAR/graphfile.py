@@ -0,0 +1,152 @@
+'''
+Binary graph file, meant to be memory mapped :
+
+	header     magic, byte order check, number of cities, number of connections, size of the names blob
+	xs, ys     float64 coordinates, one per city
+	offsets    int64, number of cities + 1 (CSR, see Graph)
+	targets    int32, one per connection
+	weights    float64, one per connection
+	names      int64 offsets (number of cities + 1) then every name in utf-8, back to back
+	order      int32 city ids sorted by name, one per city
+
+Every section starts on an 8 bytes boundary. Numbers are written in the byte order of the machine, the loader
+refuses files written with another one.
+Files written before the order section (ASTARGR1) still load, their first lookup by name then decodes every name.
+'''
+
+import mmap
+import struct
+import sys
+from collections.abc import Mapping, Sequence
+from graph import Graph
+
+MAGIC = b'ASTARGR2'
+MAGIC_WITHOUT_ORDER = b'ASTARGR1'
+HEADER = struct.Struct('=8sqqqq')
+BYTE_ORDER_CHECK = 0x0102030405060708
+
+
+def _padding(size):
+	return -size % 8
+
+
+def save(graph, filename):
+	'''Writes any Graph (whatever its arrays are made of) to a binary graph file'''
+	names = [name.encode('utf-8') for name in graph.names]
+	name_offsets = [0]
+	for name in names:
+		name_offsets.append(name_offsets[-1] + len(name))
+
+	with open(filename, 'wb') as f:
+		f.write(HEADER.pack(MAGIC, BYTE_ORDER_CHECK, len(graph), graph.num_edges, name_offsets[-1]))
+		for values in (graph.xs, graph.ys, graph.offsets, graph.targets, graph.weights):
+			data = memoryview(values).cast('B')
+			f.write(data)
+			f.write(bytes(_padding(data.nbytes)))
+		f.write(struct.pack('={0}q'.format(len(name_offsets)), *name_offsets))
+		f.write(b''.join(names))
+		f.write(bytes(_padding(name_offsets[-1])))
+		# ids sorted by the utf-8 bytes of their name, the same order as the names themselves
+		order = sorted(range(len(names)), key=names.__getitem__)
+		f.write(struct.pack('={0}i'.format(len(order)), *order))
+
+
+def convert(positions, connections, filename):
+	'''Converts a positions file and a connections file (see load_cities) to a binary graph file'''
+	save(Graph.from_files(positions, connections), filename)
+
+
+def load(filename):
+	'''
+	Memory maps a binary graph file : the Graph arrays are views over the file and the operating system loads
+	the pages on demand. Names are only decoded when they are used, a lookup by name is a binary search over
+	the order section that decodes about log2(number of cities) of them.
+	'''
+	with open(filename, 'rb') as f:
+		mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+	magic, check, num_cities, num_edges, names_size = HEADER.unpack_from(mapped)
+	if magic not in (MAGIC, MAGIC_WITHOUT_ORDER):
+		raise ValueError('{0} is not a binary graph file'.format(filename))
+	if check != BYTE_ORDER_CHECK:
+		raise ValueError('{0} was written on a machine with another byte order'.format(filename))
+
+	view = memoryview(mapped)
+	position = HEADER.size
+
+	def section(format, count, itemsize):
+		nonlocal position
+		size = count * itemsize
+		values = view[position:position + size].cast(format)
+		position += size + _padding(size)
+		return values
+
+	xs = section('d', num_cities, 8)
+	ys = section('d', num_cities, 8)
+	offsets = section('q', num_cities + 1, 8)
+	targets = section('i', num_edges, 4)
+	weights = section('d', num_edges, 8)
+	name_offsets = section('q', num_cities + 1, 8)
+	names = NameTable(name_offsets, view[position:position + names_size])
+	position += names_size + _padding(names_size)
+
+	graph = Graph(names, xs, ys, offsets, targets, weights)
+	if magic == MAGIC:
+		graph._index = NameIndex(names, section('i', num_cities, 4))
+	return graph
+
+
+class NameTable(Sequence):
+	'''City names stored back to back in utf-8, decoded one by one when needed'''
+
+	def __init__(self, offsets, blob):
+		self.offsets = offsets
+		self.blob = blob
+
+	def __getitem__(self, i):
+		if not 0 <= i < len(self):
+			raise IndexError(i)
+		return str(self.blob[self.offsets[i]:self.offsets[i + 1]], 'utf-8')
+
+	def __len__(self):
+		return len(self.offsets) - 1
+
+
+class NameIndex(Mapping):
+	'''City ids indexed by name, found by a binary search over the ids sorted by name'''
+
+	def __init__(self, names, order):
+		self.names = names
+		self.order = order
+
+	def _name(self, i):
+		return bytes(self.names.blob[self.names.offsets[i]:self.names.offsets[i + 1]])
+
+	def __getitem__(self, name):
+		key = name.encode('utf-8') if isinstance(name, str) else None
+		if key is None:
+			raise KeyError(name)
+		# last of the equal names, like a dict built in id order keeps
+		low, high = 0, len(self.order)
+		while low < high:
+			middle = (low + high) // 2
+			if key < self._name(self.order[middle]):
+				high = middle
+			else:
+				low = middle + 1
+		if low == 0 or self._name(self.order[low - 1]) != key:
+			raise KeyError(name)
+		return self.order[low - 1]
+
+	def __iter__(self):
+		return iter(self.names)
+
+	def __len__(self):
+		return len(self.order)
+
+
+if __name__ == '__main__':
+	'''
+	Usage: graphfile.py positions.txt connections.txt output.graph
+	'''
+	convert(sys.argv[1], sys.argv[2], sys.argv[3])
@@ -0,0 +1,40 @@
+import math
+
+
+def h0(*args):
+	'''Heuristic function that does nothing =)'''
+	return 0
+
+
+def h1(current_city, destination):
+	'''Heuristic function based on distance on the x axis only'''
+	return abs(current_city.x - destination.x)
+
+
+def h2(current_city, destination):
+	'''Heuristic function based on distance on the y axis only'''
+	return abs(current_city.y - destination.y)
+
+
+def h3(current_city, destination):
+	'''Heuristic function based on distance as the crow flies (raw direct distance)'''
+	return math.sqrt((current_city.x - destination.x) ** 2 + (current_city.y - destination.y) ** 2)
+
+
+def h4(current_city, destination):
+	'''Heuristic function based on Manhattan distance'''
+	return abs(current_city.x - destination.x) + abs(current_city.y - destination.y)
+
+
+def g0(*args):
+	return 0
+
+
+def g1(base_cost, current_city, destination):
+	'''Cost function to minimize total travel distance'''
+	return base_cost + current_city.neighbours[destination.name]
+
+
+def g2(base_cost, *args):
+	'''Cost function to minimize number of cities to visit'''
+	return base_cost + 1
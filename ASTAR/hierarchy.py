@@ -0,0 +1,250 @@
+import math
+from array import array
+from heapq import heapify, heappush, heappop
+from city import CityInfo
+from graph import Graph
+
+
+class Hierarchy:
+	'''
+	Contraction hierarchies.
+	Cities are contracted one by one, from the least to the most important. Contracting a city removes it from the
+	graph and adds a shortcut between two of its neighbours whenever the path through it was the only shortest one.
+	The preprocessing only keeps, for every city, the "upward" connections towards cities contracted after it,
+	in CSR form like Graph. A query is then a tiny bidirectional Dijkstra that only ever goes upward.
+	Every shortcut remembers the city it skips (middle), so the full itinerary can be unpacked.
+	Connections are expected to be two ways, as load_cities creates them.
+	'''
+
+	def __init__(self, graph, rank, offsets, targets, weights, middles):
+		self.graph = graph
+		self.rank = rank
+		self.offsets = offsets
+		self.targets = targets
+		self.weights = weights
+		self.middles = middles
+
+	@classmethod
+	def build(cls, graph, settled_limit=50):
+		'''
+		Builds the hierarchy of a Graph (or of a dict of City objects, like all_cities).
+		Cities are ordered by edge difference (shortcuts added - connections removed), plus the number of already
+		contracted neighbours and the depth of the city in the hierarchy, which keeps the contraction uniform.
+		Priorities are only updated lazily : a popped city is checked again and pushed back if it's not the least
+		important anymore.
+		Witness searches stop after settled_limit cities, a missed witness only costs a useless shortcut.
+		'''
+		if not isinstance(graph, Graph):
+			graph = Graph.from_cities(graph)
+
+		num_cities = len(graph)
+		# the remaining graph : neighbour -> (weight, middle), -1 being an original connection
+		adj = [{} for _ in range(num_cities)]
+		for city in range(num_cities):
+			for dest, cost in graph.neighbours(city):
+				if dest != city and (dest not in adj[city] or cost < adj[city][dest][0]):
+					adj[city][dest] = (cost, -1)
+					adj[dest][city] = (cost, -1)
+
+		contracted_neighbours = array('i', [0]) * num_cities
+		level = array('i', [0]) * num_cities
+		rank = array('i', [-1]) * num_cities
+		upward = [None] * num_cities
+
+		def shortcuts(city):
+			'''Shortcuts (src, dst, cost) needed to remove city from the remaining graph'''
+			result = []
+			neighbours = list(adj[city].items())
+			for i, (src, (cost_src, _)) in enumerate(neighbours):
+				# a direct connection is the cheapest witness, only search for the others
+				direct = adj[src]
+				via = {dst: cost_src + cost_dst for dst, (cost_dst, _) in neighbours[i + 1:]
+					if dst not in direct or direct[dst][0] > cost_src + cost_dst}
+				if not via:
+					continue
+				witnessed = _witness_search(adj, src, city, via, settled_limit)
+				for dst, cost in via.items():
+					if dst not in witnessed:
+						result.append((src, dst, cost))
+			return result
+
+		def priority(city, added):
+			return len(added) - len(adj[city]) + contracted_neighbours[city] + level[city]
+
+		heap = [(priority(city, shortcuts(city)), city) for city in range(num_cities)]
+		heapify(heap)
+
+		order = 0
+		while heap:
+			prio, city = heappop(heap)
+			added = shortcuts(city)
+			prio = priority(city, added)
+			if heap and prio > heap[0][0]:  # lazy update, someone else is less important now
+				heappush(heap, (prio, city))
+				continue
+
+			rank[city] = order
+			order += 1
+			upward[city] = adj[city]
+			for dest in adj[city]:
+				del adj[dest][city]
+				contracted_neighbours[dest] += 1
+				level[dest] = max(level[dest], level[city] + 1)
+			for src, dst, cost in added:
+				if dst not in adj[src] or cost < adj[src][dst][0]:
+					adj[src][dst] = (cost, city)
+					adj[dst][src] = (cost, city)
+			adj[city] = None
+
+		offsets = array('q', [0])
+		targets, weights, middles = array('i'), array('d'), array('i')
+		for city in range(num_cities):
+			for dest, (cost, middle) in upward[city].items():
+				targets.append(dest)
+				weights.append(cost)
+				middles.append(middle)
+			offsets.append(len(targets))
+
+		return cls(graph, rank, offsets, targets, weights, middles)
+
+	def save(self, filename):
+		'''Binary hierarchy file : sizes, then rank, offsets, targets, weights and middles arrays'''
+		with open(filename, 'wb') as f:
+			array('q', [len(self.rank), len(self.targets)]).tofile(f)
+			for values in (self.rank, self.offsets, self.targets, self.weights, self.middles):
+				values.tofile(f)
+
+	@classmethod
+	def load(cls, filename, graph):
+		'''Loads a hierarchy saved for graph'''
+		with open(filename, 'rb') as f:
+			header = array('q')
+			header.fromfile(f, 2)
+			num_cities, num_edges = header
+			arrays = []
+			for typecode, size in (('i', num_cities), ('q', num_cities + 1), ('i', num_edges), ('d', num_edges), ('i', num_edges)):
+				values = array(typecode)
+				values.fromfile(f, size)
+				arrays.append(values)
+		return cls(graph, *arrays)
+
+	def query(self, source, target):
+		'''
+		Shortest path between two city ids.
+		Returns the same (city, cost, iterations, open cities, itinerary) as a_star, the itinerary being unpacked
+		from the shortcuts down to original connections.
+		'''
+		offsets, targets, weights = self.offsets, self.targets, self.weights
+		heaps = ([(0, source)], [(0, target)])
+		bests = ({source: 0}, {target: 0})
+		parents = ({source: None}, {target: None})
+		settled = (set(), set())
+
+		mu = math.inf
+		meeting = None
+		i = 0
+		while heaps[0] or heaps[1]:
+			for side in (0, 1):
+				heap, best, parent = heaps[side], bests[side], parents[side]
+				if not heap:
+					continue
+				cost, city = heappop(heap)
+				if city in settled[side]:  # stale entry
+					continue
+				if cost >= mu:  # this side can't find anything better anymore
+					heap.clear()
+					continue
+
+				i += 1
+				settled[side].add(city)
+				other = bests[1 - side].get(city)
+				if other is not None and cost + other < mu:
+					mu = cost + other
+					meeting = city
+
+				for e in range(offsets[city], offsets[city + 1]):
+					dest = targets[e]
+					cost_i = cost + weights[e]
+					if cost_i < best.get(dest, math.inf):
+						best[dest] = cost_i
+						parent[dest] = city
+						heappush(heap, (cost_i, dest))
+
+		if meeting is None:  # destination can't be reached
+			return None
+
+		path = []
+		city = meeting
+		while city is not None:
+			path.append(city)
+			city = parents[0][city]
+		path.reverse()
+		city = parents[1][meeting]
+		while city is not None:
+			path.append(city)
+			city = parents[1][city]
+
+		graph = self.graph
+		final_iti = [CityInfo(prio=0, cost=0, city=graph.city(source), parent=None)]
+		cost = 0
+		for src, dst in zip(path, path[1:]):
+			for city_from, city_to, weight in self.unpack(src, dst):
+				cost += weight
+				final_iti.append(CityInfo(prio=cost, cost=cost, city=graph.city(city_to), parent=graph.city(city_from)))
+
+		open_cities = sum(len(best) - len(done) for best, done in zip(bests, settled))
+		return graph.city(target), mu, i, open_cities, iter(final_iti)
+
+	def edge(self, src, dst):
+		'''(weight, middle) of the upward connection between two cities, stored on the least important one'''
+		if self.rank[src] > self.rank[dst]:
+			src, dst = dst, src
+		found = None
+		for e in range(self.offsets[src], self.offsets[src + 1]):
+			if self.targets[e] == dst and (found is None or self.weights[e] < found[0]):
+				found = (self.weights[e], self.middles[e])
+		return found
+
+	def unpack(self, src, dst):
+		'''Original connections (src, dst, weight) hidden behind the connection between src and dst'''
+		result = []
+		stack = [(src, dst)]
+		while stack:
+			city_from, city_to = stack.pop()
+			weight, middle = self.edge(city_from, city_to)
+			if middle < 0:
+				result.append((city_from, city_to, weight))
+			else:
+				stack.append((middle, city_to))
+				stack.append((city_from, middle))
+		return result
+
+
+def _witness_search(adj, source, ignored, via, settled_limit):
+	'''
+	Bounded Dijkstra in the remaining graph that avoids the city being contracted.
+	Returns the cities of via reachable from source for at most their cost through the ignored city.
+	'''
+	max_cost = max(via.values())
+	pending = len(via)
+	witnessed = set()
+	dist = {source: 0}
+	heap = [(0, source)]
+	settled = 0
+	while heap and settled < settled_limit and pending:
+		cost, city = heappop(heap)
+		if cost > dist[city]:
+			continue
+		settled += 1
+		if city in via and city not in witnessed:  # its shortest distance is known now
+			pending -= 1
+			if cost <= via[city]:
+				witnessed.add(city)
+		for dest, (weight, _) in adj[city].items():
+			if dest == ignored:
+				continue
+			cost_i = cost + weight
+			if cost_i <= max_cost and cost_i < dist.get(dest, math.inf):
+				dist[dest] = cost_i
+				heappush(heap, (cost_i, dest))
+	return witnessed
@@ -0,0 +1,86 @@
+class SearchStats:
+	'''Counters of one search, always collected (they are plain local integers in the search loop)'''
+
+	def __init__(self, expanded=0, pushes=0, pops=0, stale=0, relaxations=0, max_frontiere=0):
+		self.expanded = expanded  # cities visited, the iterations of a_star
+		self.pushes = pushes  # entries pushed in the frontiere
+		self.pops = pops  # entries popped from the frontiere, stale ones included
+		self.stale = stale  # popped entries of cities already visited through a cheaper path
+		self.relaxations = relaxations  # connections towards cities not visited yet that were evaluated
+		self.max_frontiere = max_frontiere  # biggest size of the frontiere, stale entries included
+
+	def as_dict(self):
+		return dict(vars(self))
+
+	def __str__(self):
+		return ', '.join('{0} {1}'.format(key, value) for key, value in vars(self).items())
+
+
+class Observer:
+	'''
+	Search observer : a_star and graph.search call its hooks when one is given, and never look at it otherwise.
+	Every hook does nothing, subclasses override the ones they need.
+	The frontiere is given as it is, entries start with (priority, cost, city) and may be stale.
+	'''
+
+	def on_push(self, city, cost, prio):
+		pass
+
+	def on_stale(self, city):
+		pass
+
+	def on_expand(self, city, cost, frontiere, hist):
+		'''Called once the neighbours of city have been pushed'''
+		pass
+
+	def on_finish(self, stats):
+		pass
+
+
+class PrintObserver(Observer):
+	'''What the verbose and debug options of a_star used to print, on every iteration'''
+
+	def __init__(self, verbose=True, debug=False):
+		self.verbose = verbose
+		self.debug = debug
+
+	def on_expand(self, city, cost, frontiere, hist):
+		if self.verbose:
+			print("Went to %s" % city)
+		if self.debug:
+			print("FRONTIERE")
+			shown = set()
+			for j in sorted(frontiere):  # the first entry of a city is its best one, the others are stale
+				if j[2] not in hist and j[2] not in shown:
+					shown.add(j[2])
+					print("{0} \t cost : {1} \t priority : {2}".format(j[2], j[1], j[0]))
+			print("HIST")
+			print(*hist, sep="\n")
+			print("")
+
+
+class TraceObserver(Observer):
+	'''
+	Sampled event tracing : keeps one event out of every (push, stale, expand), up to max_events events,
+	as (event, city, cost) tuples in events.
+	'''
+
+	def __init__(self, every=100, max_events=10000):
+		self.every = every
+		self.max_events = max_events
+		self.events = []
+		self._count = 0
+
+	def _record(self, event, city, cost):
+		self._count += 1
+		if self._count % self.every == 0 and len(self.events) < self.max_events:
+			self.events.append((event, city, cost))
+
+	def on_push(self, city, cost, prio):
+		self._record('push', city, cost)
+
+	def on_stale(self, city):
+		self._record('stale', city, None)
+
+	def on_expand(self, city, cost, frontiere, hist):
+		self._record('expand', city, cost)
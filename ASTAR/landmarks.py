@@ -0,0 +1,78 @@
+import math
+import random
+from array import array
+from graph import dijkstra
+
+
+class Landmarks:
+	'''
+	ALT heuristic (A*, Landmarks, Triangle inequality).
+	A few landmarks are picked once, offline, and the shortest distance from each of them to every city is stored.
+	For any landmark L, |d(L, t) - d(L, v)| <= d(v, t) thanks to the triangle inequality, so the maximum over all
+	landmarks is a lower bound of the real cost : the heuristic is admissible (and consistent) with g1.
+	Connections being two ways, the distances from a landmark are also the distances to it.
+	'''
+
+	def __init__(self, tables):
+		self.tables = tables
+
+	@classmethod
+	def build(cls, graph, count=8, seed=None):
+		'''
+		Farthest landmark selection : the first landmark is the city the farthest from a random one, every next
+		landmark is the city the farthest from all the landmarks already picked. Landmarks end up on the borders
+		of the graph, which is where they give the tightest bounds.
+		'''
+		rand = random.Random(seed)
+		num_cities = len(graph)
+		closest = dijkstra(graph, rand.randrange(num_cities))
+		tables = []
+		for _ in range(min(count, num_cities)):
+			landmark = max(range(num_cities), key=lambda i: closest[i] if closest[i] < math.inf else -1)
+			dist = dijkstra(graph, landmark)
+			tables.append(dist)
+			if not tables[1:]:
+				closest = array('d', dist)
+			else:
+				for i in range(num_cities):
+					if dist[i] < closest[i]:
+						closest[i] = dist[i]
+		return cls(tables)
+
+	def save(self, filename):
+		with open(filename, 'wb') as f:
+			array('q', [len(self.tables), len(self.tables[0]) if self.tables else 0]).tofile(f)
+			for table in self.tables:
+				table.tofile(f)
+
+	@classmethod
+	def load(cls, filename):
+		with open(filename, 'rb') as f:
+			header = array('q')
+			header.fromfile(f, 2)
+			count, num_cities = header
+			tables = []
+			for _ in range(count):
+				table = array('d')
+				table.fromfile(f, num_cities)
+				tables.append(table)
+		return cls(tables)
+
+	def for_target(self, target):
+		'''The heuristic towards target as a function of a city id, used by graph.search'''
+		# only the landmarks that can reach target, with d(L, t) looked up once per query
+		columns = [(table[target], table) for table in self.tables if table[target] < math.inf]
+
+		def heuristic(i):
+			best = 0
+			for to_target, table in columns:
+				bound = abs(to_target - table[i])
+				if bound > best:
+					best = bound
+			return best
+
+		return heuristic
+
+	def __call__(self, current_city, destination):
+		'''Plain heuristic signature, city ids must be the ones of the Graph the landmarks were built on'''
+		return self.for_target(destination.id)(current_city.id)
@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from server import load_graph, percentile
+
+
+async def client(host, port, queries, latencies, errors):
+	'''One connection sending its queries one after the other, as JSON lines'''
+	reader, writer = await asyncio.open_connection(host, port)
+	for name_from, name_to in queries:
+		t0 = time.perf_counter()
+		writer.write(json.dumps({'from': name_from, 'to': name_to}).encode() + b'\n')
+		await writer.drain()
+		response = json.loads(await reader.readline())
+		latencies.append(time.perf_counter() - t0)
+		if 'error' in response:
+			errors.append(response['error'])
+	writer.close()
+	await writer.wait_closed()
+
+
+async def run(host, port, names, requests, concurrency, distinct, seed):
+	'''
+	Sends requests queries over concurrency connections. Queries are drawn out of distinct city pairs, so that a
+	small number of pairs shows the coalescing of identical queries in flight.
+	'''
+	rnd = random.Random(seed)
+	pairs = [tuple(rnd.sample(names, 2)) for _ in range(distinct)]
+	queries = [rnd.choice(pairs) for _ in range(requests)]
+	latencies = []
+	errors = []
+
+	t0 = time.perf_counter()
+	await asyncio.gather(*(client(host, port, queries[c::concurrency], latencies, errors) for c in range(concurrency)))
+	elapsed = time.perf_counter() - t0
+
+	reader, writer = await asyncio.open_connection(host, port)
+	writer.write(b'{"stats": true}\n')
+	await writer.drain()
+	stats = json.loads(await reader.readline())
+	writer.close()
+	await writer.wait_closed()
+
+	return {
+		'requests': requests,
+		'concurrency': concurrency,
+		'distinct': distinct,
+		'errors': len(errors),
+		'elapsed': elapsed,
+		'throughput': requests / elapsed,
+		'latency_p50': percentile(latencies, 50),
+		'latency_p90': percentile(latencies, 90),
+		'latency_p99': percentile(latencies, 99),
+		'server': stats,
+	}
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Load generator for server.py')
+	parser.add_argument('files', nargs='+', help='the graph files given to the server, to pick city names from')
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', default=8642, type=int)
+	parser.add_argument('--requests', default=1000, type=int)
+	parser.add_argument('--concurrency', action='append', type=int,
+		help='concurrent connections, can be given more than once (1, 4, 16 and 64 by default)')
+	parser.add_argument('--distinct', default=100, type=int, help='number of distinct city pairs queried')
+	parser.add_argument('--seed', default=0, type=int)
+	args = parser.parse_args()
+
+	names = list(load_graph(args.files).names)
+	for concurrency in args.concurrency or [1, 4, 16, 64]:
+		print(json.dumps(asyncio.run(run(
+			args.host, args.port, names, args.requests, concurrency, args.distinct, args.seed))))
@@ -1,79 +1,77 @@
 import sys
 import math
 import csv
-from city import City
+import graphfile
+from city import City, CityInfo
+from graph import GraphCity, search
+from heuristics import h0, h1, h2, h3, h4, g0, g1, g2
+from instrument import PrintObserver, SearchStats
 from heapq import heappush, heappop
-from collections import namedtuple
 
+# every known city indexed by name, filled by load_cities
+all_cities = {}
 
-def h0(*args):
-	'''Heuristic function that does nothing =)'''
-	return 0
-
-
-def h1(current_city, destination):
-	'''Heuristic function based on distance on the x axis only'''
-	return abs(current_city.x - destination.x)
-
-
-def h2(current_city, destination):
-	'''Heuristic function based on distance on the y axis only'''
-	return abs(current_city.y - destination.y)
-
-
-def h3(current_city, destination):
-	'''Heuristic function based on distance as the crow flies (raw direct distance)'''
-	return math.sqrt((current_city.x - destination.x) ** 2 + (current_city.y - destination.y) ** 2)
-
-
-def h4(current_city, destination):
-	'''Heuristic function based on Manhattan distance'''
-	return abs(current_city.x - destination.x) + abs(current_city.y - destination.y)
-
-
-def g0(*args):
-	return 0
-
-
-def g1(base_cost, current_city, destination):
-	'''Cost function to minimize total travel distance'''
-	return base_cost + current_city.neighbours[destination.name]
 
+def a_star(city_from, city_to, h=h3, g=g1, cities=None, observer=None, stats=False, **kwargs):
+	'''
+	A* Algorithm
+	observer (see instrument.py) gets called on every push, stale entry and expansion, verbose and debug are
+	shortcuts for a PrintObserver. With stats=True, the SearchStats of the search are added at the end of the
+	returned tuple.
+	On the compact store (GraphCity), table=True reads the heuristic from a goal table (see graph.goal_table).
+	'''
+	if observer is None and (kwargs.get('verbose', False) or kwargs.get('debug', False)):
+		observer = PrintObserver(kwargs.get('verbose', False), kwargs.get('debug', False))
 
-def g2(base_cost, *args):
-	'''Cost function to minimize number of cities to visit'''
-	return base_cost + 1
+	if kwargs.get('bidirectional', False):
+		if cities is None:
+			cities = city_from.graph if isinstance(city_from, GraphCity) else all_cities
+		return bidirectional_a_star(city_from, city_to, h, g, cities, observer, stats)
 
+	if isinstance(city_from, GraphCity):  # compact graph store, searched directly on integer ids
+		return search(city_from.graph, city_from.id, city_to.id, h, g, observer, stats, kwargs.get('table', False))
 
-def a_star(city_from, city_to, h=h3, g=g1, **kwargs):
-	'''A* Algorithm'''
+	if cities is None:
+		cities = all_cities
 
-	# frontiere is made of tuples with (city, cost_from_source, parent)
+	# frontiere is made of tuples with (prio, cost_from_source, city, parent)
 	# here we initialize frontiere with the first city, where we start the journey
 	# its base cost is 0, and its parent is None
 	frontiere = []
-	CityInfo = namedtuple('city_info', 'prio cost city parent')
 	source = CityInfo(prio=0, cost=0, city=city_from, parent=None)
 	heappush(frontiere, source)
 
+	# best known cost from the source for every city reached so far.
+	# A city is pushed again in frontiere each time a cheaper way to reach it is found, the outdated entries are
+	# simply skipped when they get popped (lazy deletion) instead of rebuilding the whole frontiere every iteration
+	best = {city_from: 0}
+
 	# keeping a trace of visited cities to prevent going in circles
 	hist = set()
 
 	# itinerary is kind of like hist but is used to recreate the best travel plan once the destination has been reached
 	itinerary = {}
 
-	# calculate iterations
+	# calculate iterations, and some more counters for SearchStats
 	i = 0
+	pushes, pops, stale, relaxations, max_frontiere = 1, 0, 0, 0, 1
 	while frontiere:
-		i += 1
 		info = heappop(frontiere)  # We get the next city to visit, the 'closest one' according to heuristic + cost
 		a_star_cost, cost, city, city_parent = info  # city_parent & a_star_cost unused
+		pops += 1
+
+		if city in hist:  # stale entry, this city has already been visited through a cheaper path
+			stale += 1
+			if observer is not None:
+				observer.on_stale(city)
+			continue
 
+		i += 1
 		hist.add(city)
 		itinerary[city] = info
 
 		if city == city_to:  # meaning we arrived at destination
-			open_cities = len(frontiere)
+			open_cities = len(best) - len(hist)  # cities reached but not visited yet, stale entries excluded
 			city_i = city
 			final_iti = []  # this will store our final itinerary
 			while city_i is not None:  # we recreate the best itinerary from destination to source, parent to parent
@@ -81,63 +79,170 @@ def a_star(city_from, city_to, h=h3, g=g1, **kwargs):
 				city_i = itinerary[city_i].parent
 
 			final = (city, cost, i, open_cities, reversed(final_iti))
-			return final
+			search_stats = SearchStats(i, pushes, pops, stale, relaxations, max_frontiere)
+			if observer is not None:
+				observer.on_finish(search_stats)
+			return final + (search_stats,) if stats else final
 
 		# reached only if destination isn't met
 		for possible_destination in city.neighbours:
-			dest = all_cities[possible_destination]
+			dest = cities[possible_destination]
 			if dest not in hist:
 				# For every neighbour of a city, we add it to the frontiere with updated cost if it has
-				# not already been visited before
+				# not already been visited before and if this path is cheaper than the best one known so far
+				relaxations += 1
 				cost_i = g(cost, city, dest)
-				dest_info = CityInfo(prio=h(dest, city_to) + cost_i, cost=cost_i, city=dest, parent=city)
-				heappush(frontiere, dest_info)
-
-		# We then delete duplicate cities in our frontiere and only keep the ones with the best heuristic + cost
-		visited_cities = set()
-		new_frontiere = []
-		while frontiere:
-			recurring = heappop(frontiere)
-			if recurring.city not in visited_cities:
-				heappush(new_frontiere, recurring)
-				visited_cities.add(recurring.city)
-		frontiere = new_frontiere
-
-		# DEBUG - displays current city, frontiere and hist at any iteration
-		if kwargs.get('verbose', False):
-			print("Went to %s" % city)
-		if kwargs.get('debug', False):
-			print("FRONTIERE")
-			for j in frontiere:
-				print("{0} \t cost : {1} \t priority : {2}".format(j.city, j.cost, j.prio))
-			print("HIST")
-			print(*hist, sep="\n")
-			print("")
+				if cost_i < best.get(dest, math.inf):
+					best[dest] = cost_i
+					dest_info = CityInfo(prio=h(dest, city_to) + cost_i, cost=cost_i, city=dest, parent=city)
+					heappush(frontiere, dest_info)
+					pushes += 1
+					if observer is not None:
+						observer.on_push(dest, cost_i, dest_info.prio)
 
+		if len(frontiere) > max_frontiere:
+			max_frontiere = len(frontiere)
+		if observer is not None:
+			observer.on_expand(city, cost, frontiere, hist)
 
-def print_itinerary(iti):
-	print("Go trough :")
-	for info in iti:
-		print(" - {0} \t then ".format(info.city))
+	if observer is not None:
+		observer.on_finish(SearchStats(i, pushes, pops, stale, relaxations, max_frontiere))
 
 
-if __name__ == '__main__':
-	positions = sys.argv[1]
-	connections = sys.argv[2]
-	all_cities = {}
+def bidirectional_a_star(city_from, city_to, h=h3, g=g1, cities=None, observer=None, stats=False):
+	'''
+	Bidirectional A* : a forward search from the source and a backward search from the destination, meeting
+	in the middle. Connections are expected to be two ways, as load_cities creates them.
+
+	Both searches use the same average potential p(v) = (h(v, destination) - h(v, source)) / 2, forward with +p
+	and backward with -p, so they work on the same reduced costs. With a consistent heuristic (h3 and g1), the best
+	meeting cost mu found so far is optimal as soon as the smallest priorities of both frontieres add up to mu.
+	Returns the same (city, cost, iterations, open cities, itinerary) as a_star, observer and stats work the same
+	way too (the counters add up both searches, max_frontiere is the biggest size of both frontieres together).
+	'''
+	if cities is None:
+		cities = all_cities
+
+	def potential(city):
+		return (h(city, city_to) - h(city, city_from)) / 2
+
+	# index 0 is the forward search, 1 the backward one
+	frontieres = ([(potential(city_from), 0, city_from)], [(-potential(city_to), 0, city_to)])
+	bests = ({city_from: 0}, {city_to: 0})
+	parents = ({city_from: None}, {city_to: None})
+	hists = (set(), set())
+	signs = (1, -1)
+
+	mu = math.inf if city_from != city_to else 0
+	meeting = city_from if city_from == city_to else None
+
+	i = 0
+	pushes, pops, stale, relaxations, max_frontiere = 2, 0, 0, 0, 2
+	while frontieres[0] and frontieres[1]:
+		if frontieres[0][0][0] + frontieres[1][0][0] >= mu:  # no path through the frontieres can beat mu anymore
+			break
+
+		side = 0 if len(frontieres[0]) <= len(frontieres[1]) else 1  # expand the smaller frontiere
+		frontiere, best, parent, hist = frontieres[side], bests[side], parents[side], hists[side]
+		other_best = bests[1 - side]
+
+		prio, cost, city = heappop(frontiere)
+		pops += 1
+		if city in hist:  # stale entry
+			stale += 1
+			if observer is not None:
+				observer.on_stale(city)
+			continue
+
+		i += 1
+		hist.add(city)
+
+		for possible_destination in city.neighbours:
+			dest = cities[possible_destination]
+			if dest not in hist:
+				# the backward search walks the connections the other way around
+				relaxations += 1
+				cost_i = g(cost, city, dest) if side == 0 else g(cost, dest, city)
+				if cost_i < best.get(dest, math.inf):
+					best[dest] = cost_i
+					parent[dest] = city
+					dest_prio = cost_i + signs[side] * potential(dest)
+					heappush(frontiere, (dest_prio, cost_i, dest))
+					pushes += 1
+					if observer is not None:
+						observer.on_push(dest, cost_i, dest_prio)
+					if dest in other_best and cost_i + other_best[dest] < mu:
+						mu = cost_i + other_best[dest]
+						meeting = dest
+
+		max_frontiere = max(max_frontiere, len(frontieres[0]) + len(frontieres[1]))
+		if observer is not None:
+			observer.on_expand(city, cost, frontiere, hist)
+
+	search_stats = SearchStats(i, pushes, pops, stale, relaxations, max_frontiere)
+	if observer is not None:
+		observer.on_finish(search_stats)
+
+	if meeting is None:  # destination can't be reached
+		return None
+
+	forward = []
+	city_i = meeting
+	while city_i is not None:
+		forward.append(city_i)
+		city_i = parents[0][city_i]
+	forward.reverse()
+	backward = []
+	city_i = parents[1][meeting]
+	while city_i is not None:
+		backward.append(city_i)
+		city_i = parents[1][city_i]
+
+	final_iti = []
+	parent = None
+	for city, cost in [(c, bests[0][c]) for c in forward] + [(c, mu - bests[1][c]) for c in backward]:
+		final_iti.append(CityInfo(prio=cost + h(city, city_to), cost=cost, city=city, parent=parent))
+		parent = city
+
+	open_cities = sum(len(best) - len(hist) for best, hist in zip(bests, hists))
+	final = (city_to, mu, i, open_cities, iter(final_iti))
+	return final + (search_stats,) if stats else final
+
+
+def load_cities(positions, connections, cities=None):
+	'''Fills cities (all_cities by default) from a positions file and a connections file'''
+	if cities is None:
+		cities = all_cities
 
 	with open(positions, newline='') as f:
 		count = 0
 		reader = csv.reader(f, delimiter=" ")
 		for name, x, y in reader:
-			all_cities[name] = City(count, name, int(x), int(y))
+			cities[name] = City(count, name, int(x), int(y))
 			count += 1
 
 	with open(connections, newline='') as f:
 		reader = csv.reader(f, delimiter=" ")
 		for src, dst, cost in reader:
-			all_cities[src].add_connection(dst, int(cost))
-			all_cities[dst].add_connection(src, int(cost))
+			cities[src].add_connection(dst, int(cost))
+			cities[dst].add_connection(src, int(cost))
+
+	return cities
+
+
+def print_itinerary(iti):
+	print("Go trough :")
+	for info in iti:
+		print(" - {0} \t then ".format(info.city))
+
+
+if __name__ == '__main__':
+	if len(sys.argv) == 2:  # binary graph file, see graphfile.py
+		all_cities = graphfile.load(sys.argv[1])
+	else:
+		positions = sys.argv[1]
+		connections = sys.argv[2]
+		load_cities(positions, connections)
 
 	start = all_cities['Warsaw']
 	objective = all_cities['Lisbon']
@@ -191,3 +296,10 @@ if __name__ == '__main__':
 	print("Reached {0} with cost {1} in {2} iterations with {3} still open cities".format(dest, cost, iteration, opened))
 	print_itinerary(itinerary)
 
+	'''
+	Recherche bidirectionnelle : deux recherches, depuis le départ et depuis l'arrivée, qui se rejoignent au milieu.
+	'''
+	dest, cost, iteration, opened, itinerary = a_star(start, objective, h3, g1, bidirectional=True)
+	print("Reached {0} with cost {1} in {2} iterations with {3} still open cities".format(dest, cost, iteration, opened))
+	print_itinerary(itinerary)
+
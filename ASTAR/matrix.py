@@ -0,0 +1,147 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from heapq import heappush, heappop
+from multiprocessing import shared_memory
+from city import CityInfo
+from graph import Graph
+
+
+def one_to_many(graph, source, targets, itineraries=False):
+	'''
+	Dijkstra from source (edge weights as cost) that stops as soon as every target is settled.
+	Returns the cost to every target (inf if unreachable) and, if asked, the itinerary to every target as a list
+	of city ids (None if unreachable).
+	'''
+	offsets, weights, dests = graph.offsets, graph.weights, graph.targets
+	pending = set(targets)
+	best = {source: 0}
+	parents = {source: None}
+	settled = set()
+	frontiere = [(0, source)]
+	while frontiere and pending:
+		cost, city = heappop(frontiere)
+		if city in settled:  # stale entry
+			continue
+		settled.add(city)
+		pending.discard(city)
+		for e in range(offsets[city], offsets[city + 1]):
+			dest = dests[e]
+			cost_i = cost + weights[e]
+			if cost_i < best.get(dest, math.inf):
+				best[dest] = cost_i
+				parents[dest] = city
+				heappush(frontiere, (cost_i, dest))
+
+	costs = [best[target] if target in settled else math.inf for target in targets]
+	if not itineraries:
+		return costs, None
+
+	paths = []
+	for target in targets:
+		if target not in settled:
+			paths.append(None)
+			continue
+		path = []
+		city = target
+		while city is not None:
+			path.append(city)
+			city = parents[city]
+		path.reverse()
+		paths.append(path)
+	return costs, paths
+
+
+def route_matrix(graph, sources, targets, itineraries=False, workers=None):
+	'''
+	Many-to-many routes : one search tree per source (one_to_many) instead of one a_star per pair.
+	graph is a Graph or a dict of City objects (like all_cities), sources and targets are city names, ids or City.
+	Sources are spread over a process pool of workers processes (all the cores by default, 1 to stay in process),
+	the graph arrays being shared with the workers through shared memory instead of being copied.
+	Returns the cost matrix (one row per source) and, if asked, the matching matrix of itineraries
+	(lists of CityInfo, like a_star, or None when the target can't be reached).
+	'''
+	if not isinstance(graph, Graph):
+		graph = Graph.from_cities(graph)
+	sources = [_id(graph, city) for city in sources]
+	targets = [_id(graph, city) for city in targets]
+	if workers is None:
+		workers = os.cpu_count() or 1
+	workers = min(workers, len(sources))
+
+	if workers <= 1:
+		rows = [one_to_many(graph, source, targets, itineraries) for source in sources]
+	else:
+		blocks, spec = _share(graph)
+		try:
+			with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(spec,)) as executor:
+				chunksize = max(1, len(sources) // (4 * workers))
+				rows = list(executor.map(_row, sources, [targets] * len(sources), [itineraries] * len(sources),
+					chunksize=chunksize))
+		finally:
+			for block in blocks:
+				block.close()
+				block.unlink()
+
+	costs = [row[0] for row in rows]
+	if not itineraries:
+		return costs
+
+	routes = []
+	for row_costs, paths in rows:
+		routes.append([_itinerary(graph, path) if path is not None else None for path in paths])
+	return costs, routes
+
+
+def _id(graph, city):
+	if isinstance(city, str):
+		return graph.index[city]
+	return getattr(city, 'id', city)
+
+
+def _itinerary(graph, path):
+	'''CityInfo itinerary from a list of city ids, with the cost of every step'''
+	final_iti = []
+	cost = 0
+	parent = None
+	for city in path:
+		if parent is not None:
+			cost += min(weight for dest, weight in graph.neighbours(parent) if dest == city)
+		final_iti.append(CityInfo(
+			prio=cost, cost=cost, city=graph.city(city), parent=graph.city(parent) if parent is not None else None))
+		parent = city
+	return final_iti
+
+
+# PROCESS POOL
+# the graph of the worker process, attached to the shared memory blocks of the parent
+_graph = None
+_blocks = None
+
+
+def _share(graph):
+	'''Copies the CSR arrays of graph into shared memory blocks, returns the blocks and how to attach to them'''
+	blocks = []
+	spec = []
+	for values in (graph.offsets, graph.targets, graph.weights):
+		data = memoryview(values).cast('B')
+		block = shared_memory.SharedMemory(create=True, size=max(1, data.nbytes))
+		block.buf[:data.nbytes] = data
+		blocks.append(block)
+		spec.append((block.name, memoryview(values).format, data.nbytes))
+	return blocks, spec
+
+
+def _attach(spec):
+	global _graph, _blocks
+	_blocks = []
+	arrays = []
+	for name, format, nbytes in spec:
+		block = shared_memory.SharedMemory(name=name)
+		_blocks.append(block)
+		arrays.append(block.buf[:nbytes].cast(format))
+	_graph = Graph(None, None, None, *arrays)
+
+
+def _row(source, targets, itineraries):
+	return one_to_many(_graph, source, targets, itineraries)
@@ -0,0 +1,194 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+import graphfile
+from graph import Graph, search
+
+
+def load_graph(files):
+	'''Graph of a binary graph file (memory mapped, see graphfile.py) or of a positions file and a connections file'''
+	if len(files) == 1:
+		return graphfile.load(files[0])
+	return Graph.from_files(*files)
+
+
+def percentile(values, q):
+	'''q-th percentile (0 to 100) of values, nearest rank'''
+	if not values:
+		return None
+	ordered = sorted(values)
+	return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+class RouteServer:
+	'''
+	Long-running route planner : the graph is loaded once, searches run on a pool of worker processes (every worker
+	loads the graph once too, a binary graph file being memory mapped it is shared by the operating system).
+	Identical queries arriving while one is being computed wait for it instead of being computed again.
+
+	Two protocols on the same port : one JSON object per line ({"from": name, "to": name} or {"stats": true}),
+	or plain HTTP GET /route?from=name&to=name and GET /stats.
+	'''
+
+	def __init__(self, files, workers=None, history=10000):
+		self.files = files
+		self.graph = load_graph(files)
+		self.workers = workers or os.cpu_count() or 1
+		self.executor = None
+		self.in_flight = {}  # (source id, target id) -> future of the search
+		self.latencies = deque(maxlen=history)  # seconds, of the last history queries
+		self.queries = 0
+		self.coalesced = 0
+		self.errors = 0
+		self.started = time.perf_counter()
+
+	def start_pool(self):
+		self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_load, initargs=(self.files,))
+
+	def close(self):
+		if self.executor is not None:
+			self.executor.shutdown()
+
+	async def route(self, name_from, name_to):
+		'''Result of a query, as the dict sent back to the client'''
+		t0 = time.perf_counter()
+		self.queries += 1
+		index = self.graph.index
+		if name_from not in index or name_to not in index:
+			self.errors += 1
+			return {'error': 'unknown city'}
+
+		key = (index[name_from], index[name_to])
+		future = self.in_flight.get(key)
+		if future is None:
+			loop = asyncio.get_running_loop()
+			future = loop.run_in_executor(self.executor, _route, *key)
+			self.in_flight[key] = future
+			future.add_done_callback(lambda done: self.in_flight.pop(key, None))
+		else:
+			self.coalesced += 1
+
+		# shield : a client going away must not cancel the search others are waiting for
+		try:
+			result = await asyncio.shield(future)
+		except Exception as e:  # the worker failed or the pool broke, only this query gets the error
+			self.errors += 1
+			return {'from': name_from, 'to': name_to, 'error': 'search failed: {0!r}'.format(e)}
+		self.latencies.append(time.perf_counter() - t0)
+		if result is None:
+			return {'from': name_from, 'to': name_to, 'error': 'unreachable'}
+		cost, route, expanded = result
+		names = self.graph.names
+		return {'from': name_from, 'to': name_to, 'cost': cost, 'route': [names[i] for i in route], 'expanded': expanded}
+
+	def stats(self):
+		latencies = list(self.latencies)
+		return {
+			'queries': self.queries,
+			'coalesced': self.coalesced,
+			'errors': self.errors,
+			'queue_depth': len(self.in_flight),  # distinct searches submitted to the pool and not done yet
+			'workers': self.workers,
+			'uptime': time.perf_counter() - self.started,
+			'latency_p50': percentile(latencies, 50),
+			'latency_p90': percentile(latencies, 90),
+			'latency_p99': percentile(latencies, 99),
+		}
+
+	async def answer(self, query):
+		if isinstance(query, dict) and query.get('stats'):
+			return self.stats()
+		if not isinstance(query, dict) or not isinstance(query.get('from'), str) or not isinstance(query.get('to'), str):
+			self.errors += 1
+			return {'error': 'expected {"from": name, "to": name} or {"stats": true}'}
+		return await self.route(query['from'], query['to'])
+
+	async def handle(self, reader, writer):
+		try:
+			first = await reader.readline()
+			if first.startswith(b'GET '):
+				await self._handle_http(first, reader, writer)
+				return
+			line = first
+			while line:
+				try:
+					response = await self.answer(json.loads(line))
+				except ValueError:
+					self.errors += 1
+					response = {'error': 'invalid JSON'}
+				writer.write(json.dumps(response).encode() + b'\n')
+				await writer.drain()
+				line = await reader.readline()
+		except ConnectionError:
+			pass
+		finally:
+			writer.close()
+
+	async def _handle_http(self, first, reader, writer):
+		while (await reader.readline()).strip():  # headers are not needed
+			pass
+		try:
+			url = urlsplit(first.split()[1].decode())
+		except (IndexError, ValueError):  # no path, not UTF-8 or not a valid URL
+			url = None
+		if url is None:
+			self.errors += 1
+			status, response = '400 Bad Request', {'error': 'bad request line'}
+		elif url.path == '/stats':
+			status, response = '200 OK', self.stats()
+		elif url.path == '/route':
+			params = {key: values[0] for key, values in parse_qs(url.query).items()}
+			status, response = '200 OK', await self.answer(params)
+		else:
+			status, response = '404 Not Found', {'error': 'not found'}
+		body = json.dumps(response).encode()
+		writer.write('HTTP/1.0 {0}\r\nContent-Type: application/json\r\nContent-Length: {1}\r\n\r\n'.format(
+			status, len(body)).encode() + body)
+		await writer.drain()
+
+	async def serve(self, host='127.0.0.1', port=8642):
+		self.start_pool()
+		server = await asyncio.start_server(self.handle, host, port)
+		try:
+			async with server:
+				await server.serve_forever()
+		finally:
+			self.close()
+
+
+# WORKER PROCESSES
+_graph = None
+
+
+def _load(files):
+	global _graph
+	_graph = load_graph(files)
+
+
+def _route(source, target):
+	'''Runs in a worker : (cost, city ids of the itinerary, expanded cities), None if unreachable'''
+	result = search(_graph, source, target)
+	if result is None:
+		return None
+	city, cost, iterations, opened, itinerary = result
+	return cost, [info.city.id for info in itinerary], iterations
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='A* route server')
+	parser.add_argument('files', nargs='+', help='a binary graph file, or a positions file and a connections file')
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', default=8642, type=int)
+	parser.add_argument('--workers', default=None, type=int, help='worker processes, all the cores by default')
+	args = parser.parse_args()
+
+	try:
+		asyncio.run(RouteServer(args.files, args.workers).serve(args.host, args.port))
+	except KeyboardInterrupt:
+		pass
@@ -0,0 +1,147 @@
+import math
+import sys
+from array import array
+from heapq import heappush, heappushpop, nlargest
+
+
+class GridIndex:
+	'''
+	Spatial index over city coordinates : cities are bucketed in square cells, stored CSR like Graph
+	(the ids of cell c are ids[starts[c]:starts[c + 1]]), so millions of points only cost a few flat arrays.
+	Nearest and radius queries only look at the cells around the query point, in growing rings.
+	'''
+
+	def __init__(self, xs, ys, cell=None):
+		self.xs = xs
+		self.ys = ys
+		num_points = len(xs)
+		self.min_x, self.max_x = (min(xs), max(xs)) if num_points else (0, 0)
+		self.min_y, self.max_y = (min(ys), max(ys)) if num_points else (0, 0)
+		width = max(self.max_x - self.min_x, 1)
+		height = max(self.max_y - self.min_y, 1)
+		if cell is None:  # about 2 points per cell
+			cell = max(math.sqrt(2 * width * height / max(num_points, 1)), sys.float_info.epsilon)
+		self.cell = cell
+		self.columns = int(width // cell) + 1
+		self.rows = int(height // cell) + 1
+
+		# counting sort of the points by cell
+		cells = array('q', (self._cell(xs[i], ys[i]) for i in range(num_points)))
+		starts = array('q', bytes(8 * (self.columns * self.rows + 1)))
+		for c in cells:
+			starts[c + 1] += 1
+		for c in range(self.columns * self.rows):
+			starts[c + 1] += starts[c]
+		ids = array('i', bytes(4 * num_points))
+		fill = array('q', starts[:-1])
+		for i, c in enumerate(cells):
+			ids[fill[c]] = i
+			fill[c] += 1
+		self.starts = starts
+		self.ids = ids
+
+	@classmethod
+	def from_graph(cls, graph, cell=None):
+		return cls(graph.xs, graph.ys, cell)
+
+	@classmethod
+	def from_cities(cls, cities, cell=None):
+		'''Index over a dict of City objects : City.id must go from 0 to len(cities) - 1, as load_cities does'''
+		ordered = sorted(cities.values())
+		return cls(array('d', (city.x for city in ordered)), array('d', (city.y for city in ordered)), cell)
+
+	def _column(self, x):
+		return min(max(int((x - self.min_x) // self.cell), 0), self.columns - 1)
+
+	def _row(self, y):
+		return min(max(int((y - self.min_y) // self.cell), 0), self.rows - 1)
+
+	def _cell(self, x, y):
+		return self._row(y) * self.columns + self._column(x)
+
+	def _ring(self, column, row, ring):
+		'''Ids of the points in the cells at exactly ring cells (Chebyshev distance) from (column, row)'''
+		starts, ids = self.starts, self.ids
+		for r in range(max(row - ring, 0), min(row + ring, self.rows - 1) + 1):
+			if abs(r - row) == ring:
+				columns = range(max(column - ring, 0), min(column + ring, self.columns - 1) + 1)
+			else:
+				columns = [c for c in (column - ring, column + ring) if 0 <= c < self.columns]
+			for c in columns:
+				cell = r * self.columns + c
+				yield from ids[starts[cell]:starts[cell + 1]]
+
+	def nearest(self, x, y, k=1):
+		'''The k closest points to (x, y), as (distance, id) sorted by distance'''
+		xs, ys = self.xs, self.ys
+		column, row = self._column(x), self._row(y)
+		# inside the grid, ring r covers at least a disc of radius r * cell around (x, y) ;
+		# outside, the unseen points are also at least the distance to the grid away on the other axis
+		outside_x = max(self.min_x - x, x - self.max_x, 0)
+		outside_y = max(self.min_y - y, y - self.max_y, 0)
+		outside = outside_x ** 2 + outside_y ** 2
+		heap = []  # max heap (negated distances) of the k best so far
+		max_ring = max(self.columns, self.rows)
+		ring = 0
+		while ring <= max_ring:
+			for i in self._ring(column, row, ring):
+				dist = (xs[i] - x) ** 2 + (ys[i] - y) ** 2
+				if len(heap) < k:
+					heappush(heap, (-dist, i))
+				elif dist < -heap[0][0]:
+					heappushpop(heap, (-dist, i))
+			# every point not seen yet is further than ring * cell
+			if len(heap) == k and -heap[0][0] <= (ring * self.cell) ** 2 + outside:
+				break
+			ring += 1
+		return [(math.sqrt(-dist), i) for dist, i in nlargest(k, heap)]
+
+	def within(self, x, y, radius):
+		'''Ids of every point at most radius away from (x, y)'''
+		xs, ys = self.xs, self.ys
+		result = []
+		for r in range(self._row(y - radius), self._row(y + radius) + 1):
+			for c in range(self._column(x - radius), self._column(x + radius) + 1):
+				cell = r * self.columns + c
+				for i in self.ids[self.starts[cell]:self.starts[cell + 1]]:
+					if (xs[i] - x) ** 2 + (ys[i] - y) ** 2 <= radius * radius:
+						result.append(i)
+		return result
+
+
+def snap(graph, x, y, index=None):
+	'''City view of graph the closest to (x, y), to start a query from any point'''
+	if index is None:
+		index = GridIndex.from_graph(graph)
+	return graph.city(index.nearest(x, y)[0][1])
+
+
+def knn_connections(positions, connections, k=4):
+	'''
+	Writes a connections file linking every city of a positions file to its k nearest neighbours, with road costs
+	never shorter than the crow flies (see generator.road_cost).
+	'''
+	names = []
+	xs, ys = array('d'), array('d')
+	with open(positions) as f:
+		for line in f:
+			name, x, y = line.split()
+			names.append(name)
+			xs.append(int(x))
+			ys.append(int(y))
+
+	index = GridIndex(xs, ys)
+	written = set()
+	with open(connections, 'w') as f:
+		for i in range(len(names)):
+			for dist, j in index.nearest(xs[i], ys[i], k + 1):
+				if j != i and (min(i, j), max(i, j)) not in written:  # connections are two ways, write them once
+					written.add((min(i, j), max(i, j)))
+					f.write('{0} {1} {2}\n'.format(names[i], names[j], int(math.ceil(dist))))
+
+
+if __name__ == '__main__':
+	'''
+	Usage: spatial.py positions.txt connections.txt [k]
+	'''
+	knn_connections(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 4)
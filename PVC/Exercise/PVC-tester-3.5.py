@@ -21,6 +21,7 @@ Python 3.5 Ready, Romain Claret
 
 modules = (
     "RamseyerSerex",
+    "RamseyerSerexLK",
 	# "Claret_Visinand",
 	# ventuellement d'autres modules pour comparer plusieurs versions...
 )
@@ -19,6 +19,7 @@ v0.3, hatem Ghorbel, HE-Arc
 
 modules = (
 	"RamseyerSerex",
+	"RamseyerSerexLK",
 	# ventuellement d'autres modules pour comparer plusieurs versions...
 )
 
@@ -1,10 +1,11 @@
-import pygame
-from pygame.locals import KEYDOWN, QUIT, MOUSEBUTTONDOWN, K_RETURN, K_ESCAPE
-from collections import namedtuple
-from heapq import heappush, heappop
 import time
 from time import sleep
-import sys, argparse, csv, math, random
+import sys, argparse, csv, math, random, queue
+from collections import deque
+import multiprocessing
+import numpy
+import localsearch
+import seeding
 
 # CLASS DEFINITIONS
 
@@ -44,7 +45,197 @@ class City:
 		return self.id
 
 
+class Distances:
+	"""
+	Distances entre les villes d'un problème, indexées par City.id.
+	Jusqu'à max_matrix_cities villes, toutes les distances sont calculées une seule fois dans une matrice float32
+	(n * n * 4 octets). Au-delà, la matrice ne tiendrait plus en mémoire et les distances sont recalculées à partir
+	des coordonnées, toujours de manière vectorisée sur des routes entières.
+	Les routes sont des séquences d'id de villes et sont fermées : le retour à la première ville est compté.
+	"""
+
+	def __init__(self, cities, max_cities=None):
+		if max_cities is None:
+			max_cities = max_matrix_cities
+		ordered = sorted(cities)
+		self.xs = numpy.array([city.x for city in ordered], dtype=numpy.float64)
+		self.ys = numpy.array([city.y for city in ordered], dtype=numpy.float64)
+		self.matrix = None
+		self._neighbours = {}
+		if len(ordered) <= max_cities:
+			self.matrix = numpy.hypot(
+				self.xs[:, None] - self.xs[None, :], self.ys[:, None] - self.ys[None, :]).astype(numpy.float32)
+
+	def __call__(self, i, j):
+		if self.matrix is not None:
+			return float(self.matrix[i, j])
+		return math.hypot(self.xs[i] - self.xs[j], self.ys[i] - self.ys[j])
+
+	def edge_costs(self, sources, destinations):
+		"""Longueurs (float64) des arêtes sources[i] -> destinations[i]"""
+		sources = numpy.asarray(sources)
+		destinations = numpy.asarray(destinations)
+		if self.matrix is not None:
+			return self.matrix[sources, destinations].astype(numpy.float64)
+		return numpy.hypot(self.xs[sources] - self.xs[destinations], self.ys[sources] - self.ys[destinations])
+
+	def delta(self, old, new, edges):
+		"""
+		Différence de coût entre deux routes de même longueur qui ne diffèrent que par les arêtes
+		données, l'arête p allant de la ville en position p à la suivante. Seules ces arêtes sont évaluées.
+		"""
+		n = len(old)
+		edges = {p % n for p in edges}
+		if len(edges) <= 8:  # a few lookups cost less than building arrays
+			return sum(self(new[p], new[(p + 1) % n]) - self(old[p], old[(p + 1) % n]) for p in edges)
+		following = [(p + 1) % n for p in edges]
+		before = self.edge_costs([old[p] for p in edges], [old[p] for p in following])
+		after = self.edge_costs([new[p] for p in edges], [new[p] for p in following])
+		return float(after.sum() - before.sum())
+
+	def batch_delta(self, old, new):
+		"""
+		Différence de coût entre chaque ligne de new et la même ligne de old, en n'évaluant que les arêtes dont au
+		moins une ville a changé de place.
+		"""
+		changed = old != new
+		touched = changed | numpy.roll(changed, -1, axis=1)  # edge p goes from p to p + 1
+		rows, edges = numpy.nonzero(touched)
+		following = (edges + 1) % old.shape[1]
+		before = self.edge_costs(old[rows, edges], old[rows, following])
+		after = self.edge_costs(new[rows, edges], new[rows, following])
+		return numpy.bincount(rows, weights=after - before, minlength=len(old))
+
+	def route_cost(self, route):
+		return float(self.batch_cost(numpy.asarray(route)[None, :])[0])
+
+	def batch_cost(self, routes):
+		"""Coût de chaque ligne de routes (tableau 2-D d'id de villes), en un seul appel vectorisé"""
+		routes = numpy.asarray(routes)
+		following = numpy.roll(routes, -1, axis=1)
+		if self.matrix is not None:
+			return self.matrix[routes, following].sum(axis=1, dtype=numpy.float64)
+		return numpy.hypot(self.xs[routes] - self.xs[following], self.ys[routes] - self.ys[following]).sum(axis=1)
+
+	def neighbours(self, k):
+		"""Les k plus proches voisins de chaque ville (voir seeding.neighbours), calculés une seule fois"""
+		if k not in self._neighbours:
+			self._neighbours[k] = seeding.neighbours(self.xs.tolist(), self.ys.tolist(), k)
+		return self._neighbours[k]
+
+	def exact_cost(self, route):
+		"""Coût en float64, dans le même ordre que PVC-tester, pour la route rendue à la fin"""
+		cost = 0
+		for i, j in zip(route, list(route[1:]) + list(route[:1])):
+			cost += math.hypot(self.xs[j] - self.xs[i], self.ys[j] - self.ys[i])
+		return cost
+
+
+class Scheduler:
+	"""
+	Décide s'il reste le temps pour une génération de plus avant deadline (en secondes de perf_counter, None pour
+	ne jamais s'arrêter).
+	La durée d'une génération est prédite par la plus longue des recent dernières (ramenées à une génération
+	complète), fois safety. Quand une génération complète ne tient plus, mais une fraction d'au moins min_scale,
+	next_scale rend cette fraction : la génération suivante fait moins d'enfants, de mutants et de recherches locales.
+	Rien ne dit combien dure la première génération (plusieurs secondes avec quelques milliers de villes) : elle ne
+	fait que min_scale d'une génération, et chacune peut ensuite faire au plus le double de la précédente.
+	Garde aussi trace, la liste des (secondes depuis started, génération, meilleur coût) à chaque amélioration.
+	"""
+
+	def __init__(self, started, deadline, min_scale=0.1, safety=1.5, recent=10):
+		self.started = started
+		self.deadline = deadline
+		self.min_scale = min_scale
+		self.safety = safety
+		self.durations = deque(maxlen=recent)
+		self.generations = 0
+		self.trace = []
+		self._begin = None
+		self._scale = min_scale / 2
+
+	def next_scale(self):
+		"""Fraction de génération à faire (1 pour une complète), 0 s'il faut s'arrêter"""
+		self._begin = time.perf_counter()
+		if self.deadline is None:
+			return 1
+		remaining = self.deadline - self._begin
+		scale = min(2 * self._scale, 1)
+		if self.durations:
+			scale = min(scale, remaining / (self.safety * max(self.durations)))
+		elif remaining <= 0:
+			scale = 0
+		return scale if scale >= self.min_scale else 0
+
+	def done(self, scale, cost):
+		"""Fin d'une génération faite avec scale, cost étant le meilleur coût obtenu"""
+		self.durations.append((time.perf_counter() - self._begin) / scale)
+		self._scale = scale
+		self.generations += 1
+		self.record(cost)
+
+	def record(self, cost):
+		if not self.trace or cost < self.trace[-1][2]:
+			self.trace.append((time.perf_counter() - self.started, self.generations, float(cost)))
+
+
+class Renderer:
+	"""
+	Affichage de la meilleure route pendant la recherche. show() ne fait que garder une copie de la route, update()
+	est appelé entre deux générations et la dessine au plus max_fps fois par seconde, seulement quand elle a changé :
+	les routes gardées entre deux images sont sautées. Tout se passe sur le thread principal, le seul depuis lequel
+	SDL sait dessiner, et les événements de la fenêtre sont traités à chaque image.
+	"""
+
+	def __init__(self, cities, max_fps):
+		self.cities = cities
+		self.interval = 1 / max_fps
+		self.snapshot = None
+		self.frames = 0
+		self._next_frame = 0
+
+	def show(self, route, cost):
+		self.snapshot = (route.copy(), cost)
+
+	def update(self):
+		now = time.perf_counter()
+		if now < self._next_frame:
+			return
+		self._next_frame = now + self.interval
+		pygame.event.pump()
+		if self.snapshot is not None:
+			self._draw()
+
+	def flush(self):
+		"""Dessine la dernière route gardée, s'il y en a une"""
+		if self.snapshot is not None:
+			self._draw()
+
+	def _draw(self):
+		route, cost = self.snapshot
+		self.snapshot = None
+		draw(self.cities, flip=False)
+		draw_itinerary("Un chemin de cout {0:.0f}".format(cost), [self.cities[i] for i in route])
+		self.frames += 1
+
+
 # METHOD DEFINITIONS
+def init_display():
+	"""
+	Ouvre la fenêtre. pygame n'est importé qu'ici, pour que le module s'importe sans rien faire d'autre et vite
+	quand il n'y a pas d'affichage (PVC-tester, benchmarks, îles).
+	"""
+	global pygame, screen, font
+	if screen is not None:
+		return
+	import pygame
+	pygame.init()
+	pygame.display.set_mode((screen_x, screen_y))
+	pygame.display.set_caption('Exemple')
+	screen = pygame.display.get_surface()
+	font = pygame.font.Font(None, 30)
+
+
 def draw(positions, **kwargs):
 	screen.fill(0)
 	for pos in positions:
@@ -53,7 +244,8 @@ def draw(positions, **kwargs):
 		text = font.render("Nombre: %i" % len(positions), True, font_color)
 		textRect = text.get_rect()
 		screen.blit(text, textRect)
-	pygame.display.flip()
+	if kwargs.get('flip', True):
+		pygame.display.flip()
 
 
 def draw_itinerary(text, cities):
@@ -81,50 +273,22 @@ def parse_filename(filename):
 	return cities
 
 
-def init_itinerary(all_cities):
-	"""
-	Cette méthode permet d'initialiser un individu de la population d'origine
-	à l'aide d'un algorithme glouton.
-	Cet algo va parcrouir les villes en rejoignant toujours la ville la plus proche de son lieu actuel.
-	En comparaison du reste de l'algorithme, elle est assez performante pour ne pas pas impacter sur
-	la performances globale du programme. Elle donne également une bonne base pour débuter la partie génétique.
-	"""
+def route_dtype(num_cities):
+	"""Plus petit type entier pouvant contenir les id des villes, pour les lignes de la population"""
+	return numpy.int16 if num_cities <= numpy.iinfo(numpy.int16).max else numpy.int32
 
-	result = []
 
-	cities = list(all_cities)  # copy to let base list untouched
-	result.append(cities.pop(0))
-	while cities:
-		min = 0
-		dist = math.inf
-		for i, city in enumerate(cities):
-			tmp = euclidian(result[-1], city)
-			if tmp < dist:
-				dist = tmp
-				min = i
-		result.append(cities.pop(min))
-
-	cost = calculate_cost(result)
-
-	return child(cost, result)
-
-
-def init_rand_itinerary(all_cities):
+def init_rand_itineraries(all_cities, num_children):
 	"""
-	Cette méthode génère un individu aléatoire pour la première population.
+	Cette méthode génère d'un coup des individus aléatoires pour la première population.
+	Ils commencent tous par la première ville.
 	"""
-	result = []
-	cities = list(all_cities)  # copy to let base list untouched
-	result.append(cities.pop(0))
-	while cities:
-		i = random.randint(0, len(cities)-1)
-		result.append(cities.pop(i))
-
-	cost = calculate_cost(result)
-	return child(cost, result)
+	ids = numpy.array([city.id for city in all_cities], dtype=route_dtype(len(all_cities)))
+	order = rng.random((num_children, len(ids) - 1)).argsort(axis=1) + 1
+	return numpy.concatenate((ids[numpy.zeros((num_children, 1), order.dtype)], ids[order]), axis=1)
 
 
-def crossover(pop, sequence_proportion, child_proportion, num_parents_proportion):
+def crossover(routes, costs, sequence_proportion, child_proportion, num_parents_proportion, dist):
 	"""
 	Cette méthode va effecteur des crossover sur toute la population, par plage successive.
 	Elle commence par faire le crossover des individus les plus performants, puis va parcourir la population restante
@@ -135,62 +299,109 @@ def crossover(pop, sequence_proportion, child_proportion, num_parents_proportion
 	totale, évitant de tomber trop facilement dans des minimums locaux.
 
 	Tous les enfants comme les parents sont gardés dans la population pour être ensuite mutés et resélectionné.
+	La population est triée par coût (voir natural_selection), les enfants sont rendus dans deux tableaux à part.
+
+	Chaque couple donne child_proportion * N paires d'enfants, chaque paire avec ses propres points de coupe (voir
+	crossover_ox). Les enfants identiques à leur parent ou à un autre enfant ne sont pas gardés.
 	"""
-	num_people = len(pop)
-	# the elite
-	mom = heappop(pop)
-	dad = heappop(pop)
-	crossover_one(pop, sequence_proportion, child_proportion, mom, dad)
-	# keeping the parents for next selection
-	heappush(pop, mom)
-	heappush(pop, dad)
+	num_people, num_cities = routes.shape
+	num_children = int(child_proportion * num_cities)
+	sequence_size = int(sequence_proportion * num_cities)
 
-	# some pseudo random parents
+	# the elite, then some pseudo random parents
 	num_parents = int(num_people * num_parents_proportion)
-	for _ in range(num_parents):
-		mom = pop[random.randint(0, num_people - 1)]
-		dad = pop[random.randint(0, num_people - 1)]
-		crossover_one(pop, sequence_proportion, child_proportion, mom, dad)
+	moms = numpy.concatenate(([0], rng.integers(0, num_people, num_parents))).repeat(num_children)
+	dads = numpy.concatenate(([1], rng.integers(0, num_people, num_parents))).repeat(num_children)
+	begin = rng.integers(0, num_cities - sequence_size, len(moms))
+
+	parents = numpy.concatenate((moms, dads))
+	children = numpy.concatenate((
+		crossover_ox(routes[moms], routes[dads], begin, sequence_size),
+		crossover_ox(routes[dads], routes[moms], begin, sequence_size)))
+
+	# no clones : children equal to their parent, then children equal to another one
+	different = (children != routes[parents]).any(axis=1)
+	children, parents = children[different], parents[different]
+	if len(children):
+		first = numpy.sort(numpy.unique(children, axis=0, return_index=True)[1])
+		children, parents = children[first], parents[first]
 
+	return children, costs[parents] + dist.batch_delta(routes[parents], children)
 
-def crossover_one(pop, sequence_proportion, child_proportion, mom, dad):
+
+def crossover_ox(parents, donors, begin, sequence_size):
+	"""
+	La méthode de crossover est la méthode OX, sur toutes les lignes d'un coup.
+	Chaque enfant reçoit la séquence de son donneur qui commence à begin, à la même place, et garde l'ordre de son
+	parent pour le reste : les villes de la séquence sont enlevées du parent et les villes qu'elle remplace
+	prennent leurs places, dans l'ordre.
+	Une table d'appartenance (ville -> dans la séquence ou non) évite de chercher chaque ville dans la séquence,
+	un enfant coûte donc O(N) au lieu de O(N * taille de la séquence).
+	"""
+	num_children, num_cities = parents.shape
+	rows = numpy.arange(num_children)[:, None]
+	segment = begin[:, None] + numpy.arange(sequence_size)
+	sequence = donors[rows, segment]
+
+	member = numpy.zeros((num_children, num_cities), bool)  # indexed by city id
+	member[rows, sequence] = True
+	in_segment = numpy.zeros((num_children, num_cities), bool)  # indexed by position
+	in_segment[rows, segment] = True
+
+	moved = member[rows, parents]
+	holes = moved & ~in_segment  # where the cities of the sequence were
+	displaced = ~moved & in_segment  # cities replaced by the sequence
+	children = parents.copy()
+	children[holes] = parents[displaced]  # row by row, both have as many cells in every row
+	children[in_segment] = sequence.ravel()
+	return children
+
+
+def crossover_one(mom, mom_cost, dad, dad_cost, sequence_proportion, child_proportion, dist):
 	"""
-	La méthode de crossover est la méthode OX.
-	On sélectionne une séquence au hasard dans le code génétique des parents et on les swap entre les deux parents.
-	En évitant la redondance (avec les méthodes prepare_child et fill_sequence), on obtient finalement deux enfant
-	distincts pour chaque crossover.
+	Ancienne méthode de crossover, en O(N * taille de la séquence) par enfant et avec les mêmes points de coupe pour
+	tous les enfants d'un couple (qui sont donc identiques). Gardée comme référence pour benchmark_crossover.
 	"""
-	num_cities = len(mom.route)
+	num_cities = len(mom)
 	num_children = int(child_proportion * num_cities)
 	sequence_size = int(sequence_proportion * num_cities)
 	begin = random.randint(0, num_cities - sequence_size - 1)
 	end = begin + sequence_size
 
-	sequ1 = fill_sequence(mom, begin, end)
-	sequ2 = fill_sequence(dad, begin, end)
+	mom_route = mom.tolist()
+	dad_route = dad.tolist()
+	sequ1 = mom_route[begin:end]
+	sequ2 = dad_route[begin:end]
 
+	children = numpy.empty((2 * num_children, num_cities), mom.dtype)
+	costs = numpy.empty(2 * num_children)
 	for i in range(num_children):
-		child1 = list(mom.route)
-		child2 = list(dad.route)
+		child1 = list(mom_route)
+		child2 = list(dad_route)
 		empty_idx1 = []
 		empty_idx2 = []
-		prepare_child(child1, mom.route, sequ2, empty_idx1, begin, end)
-		prepare_child(child2, dad.route, sequ1, empty_idx2, begin, end)
+		prepare_child(child1, mom_route, sequ2, empty_idx1, begin, end)
+		prepare_child(child2, dad_route, sequ1, empty_idx2, begin, end)
+		# only the cities of the sequence and the ones moved to make room for it change, so do their edges
+		edges1 = changed_edges(range(begin, end), empty_idx1)
+		edges2 = changed_edges(range(begin, end), empty_idx2)
 		insert_sequence(child1, sequ2, empty_idx1, begin, end)
 		insert_sequence(child2, sequ1, empty_idx2, begin, end)
-		cost1 = calculate_cost(child1)
-		cost2 = calculate_cost(child2)
-		heappush(pop, child(cost1, child1))
-		heappush(pop, child(cost2, child2))
+		children[2 * i] = child1
+		children[2 * i + 1] = child2
+		costs[2 * i] = mom_cost + dist.delta(mom_route, child1, edges1)
+		costs[2 * i + 1] = dad_cost + dist.delta(dad_route, child2, edges2)
+	return children, costs
 
 
-
-def fill_sequence(parent, begin, end):
-	sequ = []
-	for i in range(begin, end):
-		city = parent.route[i]
-		sequ.append(city)
-	return sequ
+def changed_edges(*positions):
+	"""Arêtes touchées par un changement des villes aux positions données : celle qui arrive et celle qui part"""
+	edges = set()
+	for group in positions:
+		for i in group:
+			edges.add(i - 1)
+			edges.add(i)
+	return edges
 
 
 def insert_sequence(child, sequ, empty_idx, begin, end):
@@ -212,162 +423,519 @@ def prepare_child(child, parent, sequence, empty_idx, begin, end):
 			child[i] = city
 
 
-def natural_selection(pop, num_cities):
+def natural_selection(routes, costs, num_cities):
 	"""
-	Pour la sélection, on ne prend que les N meilleurs individus pour N villes.
+	Pour la sélection, on ne prend que les N meilleurs individus pour N villes, triés par coût.
 	"""
-	return [heappop(pop) for _ in range(num_cities)]
-
-
-def calculate_cost(cities):
-	cost = 0
-	for i in range(1, len(cities)):
-		cost += euclidian(cities[i - 1], cities[i])
-	return cost
-
-
-def manhattan(city1, city2):
-	return abs(city1.x - city2.x) + abs(city1.y - city2.y)  # Manhattan, because performance
+	best = numpy.argsort(costs, kind='stable')[:num_cities]
+	return routes[best], costs[best]
 
-def euclidian(city1, city2):
-	return math.sqrt((city1.x - city2.x) ** 2 + (city1.y - city2.y) ** 2)
 
-
-def populate(cities):
-	population = []
-
-	# interary with simple order from cities
-	eve = child(calculate_cost(cities), list(cities))
-	heappush(population, eve)
-
-	# interary --> the next city is the closest
-	adam = init_itinerary(list(cities))
-	heappush(population, adam)
-
-	# and finally some random fellows
-	for _ in range(0, len(cities) - 2):
-		heappush(population, init_rand_itinerary(cities))
-
-	return population
+def populate(cities, dist, strategies=None):
+	"""
+	Première population, une ligne par individu dans routes (les id des villes dans l'ordre du parcours) et leurs
+	coûts dans costs, triés par coût.
+
+	Les premiers individus viennent des heuristiques de construction de seeding.py, choisies par strategies (par
+	défaut seeding_strategies) :
+		nn          plus proche voisin, depuis la première ville puis depuis des villes au hasard
+		greedy      couplage glouton
+		curve       courbe de Hilbert, telle quelle puis tournée au hasard
+		insertion   insertions aléatoires
+		random      le reste de la population est fait d'individus aléatoires
+	nn, curve et insertion donnent chacune seeds_per_strategy individus. Sans random, le reste de la population est
+	fait de mutants des individus construits (voir mutate), pour qu'ils ne soient pas tous identiques.
+	"""
+	if strategies is None:
+		strategies = seeding_strategies
+	num_cities = len(cities)
+	xs, ys = dist.xs.tolist(), dist.ys.tolist()
+	count = min(seeds_per_strategy, num_cities)
+
+	seeds = []
+	if 'nn' in strategies:
+		starts = [0] + random.sample(range(1, num_cities), count - 1) if num_cities > 1 else [0]
+		seeds += [seeding.nearest_neighbour(xs, ys, start) for start in starts]
+	if 'greedy' in strategies and num_cities > 1:
+		seeds.append(seeding.greedy_edge(xs, ys, dist.neighbours(candidate_neighbours)))
+	if 'curve' in strategies:
+		seeds += [seeding.hilbert_order(xs, ys, None if i == 0 else rng) for i in range(count)]
+	if 'insertion' in strategies:
+		seeds += [seeding.randomized_insertion(xs, ys, random.Random(random.getrandbits(64))) for _ in range(count)]
+
+	if not seeds:
+		routes = init_rand_itineraries(cities, num_cities)
+		return natural_selection(routes, dist.batch_cost(routes), num_cities)
+	routes = numpy.array(seeds, dtype=route_dtype(num_cities))
+	routes, costs = natural_selection(routes, dist.batch_cost(routes), num_cities)
+	missing = num_cities - len(routes)
+	if missing > 0:
+		if 'random' in strategies:
+			others = init_rand_itineraries(cities, missing)
+			others_costs = dist.batch_cost(others)
+		else:
+			picked = numpy.arange(missing) % len(routes)
+			others, others_costs = mutate(routes[picked], costs[picked], mutation_num_swap, 1, dist)
+		routes = numpy.concatenate((routes, others))
+		costs = numpy.concatenate((costs, others_costs))
+	return natural_selection(routes, costs, num_cities)
 
 
-def mutate(population, swap_proportion, proportion):
+def mutate(routes, costs, swap_proportion, proportion, dist):
 	"""
 	Pour la mutation, on va sélectionner de manière random un certain pourcentage de la population pour la faire muter.
 	On duplique un individu avant de le muter, et on garde les deux individus pour la prochaine sélection.
-	"""
-	nb_to_mute = int(len(population)*proportion)
-	sequ_swap_size = int(len(population[0].route) * swap_proportion / 2)
-
-	for _ in range(0, nb_to_mute):
-		rand = random.randint(0, len(population)-1)
-		heappush(population, mutateOne(population[rand], sequ_swap_size))
-
-	return population
-
 
-def mutateOne(fellow_in, sequence_size_swap):
-	"""
-	Pour la mutation, on sélectionne une séquence aléatoire de taille aléatoire comprise entre 0 et la moitié de la
-	longueur d'un individu, dans la première partie de l'individu. On échange ensuite cette séquence avec une autre
-	séquence, de même taille, sur la deuxième moitié de l'individu.
+	Pour chaque mutant, on sélectionne une séquence aléatoire dans la première partie de l'individu. On échange ensuite
+	cette séquence avec une autre séquence, de même taille, sur la deuxième moitié de l'individu.
 	On swap donc des portions de routes, et pas que des villes isolées.
+	Tous les mutants sont faits d'un coup, et rendus dans deux tableaux à part.
 	"""
-	route = list(fellow_in.route)
-	idx_begin1 = random.randint(0, int(len(route) / 2 - sequence_size_swap - 1))
-	idx_begin2 = random.randint(int(len(route) / 2), int(len(route) - sequence_size_swap - 1))
-	idx_end1 = idx_begin1 + sequence_size_swap
-	idx_end2 = idx_begin2 + sequence_size_swap
-
-	sub_list1 = route[idx_begin1:idx_end1 + 1]
-	sub_list2 = route[idx_begin2:idx_end2 + 1]
-	sub_list1, sub_list2 = sub_list2, sub_list1
-	route[idx_begin1:idx_end1 + 1] = sub_list1
-	route[idx_begin2:idx_end2 + 1] = sub_list2
-
-	return child(calculate_cost(route), route)
+	num_people, num_cities = routes.shape
+	nb_to_mute = int(num_people * proportion)
+	size = int(num_cities * swap_proportion / 2) + 1  # length of the swapped segments
+
+	chosen = rng.integers(0, num_people, nb_to_mute)
+	begin1 = rng.integers(0, int(num_cities / 2 - size) + 1, nb_to_mute)
+	begin2 = rng.integers(int(num_cities / 2), int(num_cities - size) + 1, nb_to_mute)
+
+	# every mutant reads its parent through a table of positions, where the two segments are swapped
+	rows = numpy.arange(nb_to_mute)[:, None]
+	segment1 = begin1[:, None] + numpy.arange(size)
+	segment2 = begin2[:, None] + numpy.arange(size)
+	positions = numpy.tile(numpy.arange(num_cities), (nb_to_mute, 1))
+	positions[rows, segment1] = segment2
+	positions[rows, segment2] = segment1
+	parents = routes[chosen]
+	mutants = numpy.take_along_axis(parents, positions, axis=1)
+
+	# the segments keep their inner order, only the edges at their four ends change (edge p goes from p to p + 1),
+	# an edge shared by both ends (adjacent segments, or the one closing the tour) must only be counted once
+	edges = numpy.stack((begin1 - 1, begin1 + size - 1, begin2 - 1, begin2 + size - 1), axis=1) % num_cities
+	unique = numpy.ones(edges.shape)
+	unique[:, 2] = edges[:, 2] != edges[:, 1]
+	unique[:, 3] = edges[:, 3] != edges[:, 0]
+	following = (edges + 1) % num_cities
+	before = dist.edge_costs(parents[rows, edges], parents[rows, following])
+	after = dist.edge_costs(mutants[rows, edges], mutants[rows, following])
+
+	return mutants, costs[chosen] + ((after - before) * unique).sum(axis=1)
+
+
+def parameters(**variations):
+	"""Paramètres de l'algorithme génétique, ceux du module sauf ceux donnés"""
+	params = dict(
+		crossover_sequence_size=crossover_sequence_size,
+		crossover_child_proportion=crossover_child_proportion,
+		num_parents_proportion=num_parents_proportion,
+		mutation_num_swap=mutation_num_swap,
+		mutation_proportion=mutation_proportion,
+		memetic_offspring=memetic_offspring,
+		seeding=seeding_strategies)
+	params.update(variations)
+	return params
+
+
+def generation(routes, costs, num_cities, dist, params, scale=1):
+	"""
+	Une génération : crossover, recherche locale sur les meilleurs enfants (algorithme mémétique, si
+	memetic_offspring n'est pas nul), mutation et sélection des num_cities meilleurs.
+	Avec scale < 1, seulement cette fraction des enfants, des mutants et des recherches locales (voir Scheduler).
+	"""
+	children, children_costs = crossover(routes, costs, params['crossover_sequence_size'],
+		params['crossover_child_proportion'] * scale, params['num_parents_proportion'], dist)
+	if params['memetic_offspring']:
+		improve(children, children_costs, math.ceil(params['memetic_offspring'] * scale), dist)
+	routes = numpy.concatenate((routes, children))
+	costs = numpy.concatenate((costs, children_costs))
+	mutants, mutants_costs = mutate(routes, costs, params['mutation_num_swap'], params['mutation_proportion'] * scale,
+		dist)
+	return natural_selection(
+		numpy.concatenate((routes, mutants)), numpy.concatenate((costs, mutants_costs)), num_cities)
+
+
+def improve(routes, costs, count, dist):
+	"""
+	Recherche locale 2-opt / Or-opt (voir localsearch.py) sur les count meilleures lignes de routes, modifiées en
+	place comme leurs coûts.
+	"""
+	xs = dist.xs.tolist()
+	ys = dist.ys.tolist()
+	neighbours = dist.neighbours(candidate_neighbours)
+	for i in numpy.argsort(costs, kind='stable')[:count]:
+		route = routes[i].tolist()
+		if localsearch.local_search(route, xs, ys, neighbours):
+			routes[i] = route
+			costs[i] = dist.route_cost(routes[i])
 
 
-def ga_solve(file=None, gui=True, maxtime=0):
+def ga_solve(file=None, gui=True, maxtime=0, trace=None):
+	"""
+	Algorithme génétique sur les villes du fichier file, ou sur celles cliquées dans la fenêtre sans fichier.
+	Rend [coût, noms des villes dans l'ordre de la route], comme PVC-tester l'attend.
+	Avec maxtime, tout (lecture du fichier comprise) doit se terminer time_margin secondes avant : voir Scheduler.
+	Si trace est une liste, on y ajoute les (secondes, génération, meilleur coût) à chaque amélioration.
+	"""
+	t0 = time.perf_counter()
 	cities = parse_filename(file)
 	if gui:
+		init_display()
 		draw(cities)
 
 	collecting = True
 	id_count = 0
 	while collecting and not file:
 		for event in pygame.event.get():
-			if event.type == QUIT:
+			if event.type == pygame.QUIT:
 				sys.exit(0)
-			elif event.type == KEYDOWN and event.key == K_RETURN:
+			elif event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
 				collecting = False
-			elif event.type == MOUSEBUTTONDOWN:
+			elif event.type == pygame.MOUSEBUTTONDOWN:
 				pos = pygame.mouse.get_pos()
 				cities.append(City(id_count, id_count, pos[0], pos[1]))
 				id_count += 1
 				draw(cities, verbose=True)
+		# the time spent clicking does not count
+		t0 = time.perf_counter()
 
 	cost_old = 0
 	cpt = 0
 
 	num_cities = len(cities)
-	t0 = time.clock()
+	scheduler = Scheduler(t0, t0 + maxtime - time_margin if maxtime != 0 else None)
 
-	population = populate(cities)
+	dist = Distances(cities)
+	params = parameters()
+	routes, costs = populate(cities, dist, params['seeding'])
+	scheduler.record(costs[0])
+	renderer = None
+	if gui:
+		renderer = Renderer(cities, max_fps)
 
 	# if maxtime equals 0 the counter will stop the loop when it will reach max_no_cost_change
-	# otherwise the timer will stop it
+	# otherwise the scheduler will stop it
 	# the counter is incremented when there is no cost change between two iterations of the loop
-	while (maxtime != 0 and time.clock() - t0 <= maxtime) or (maxtime == 0 and cpt <= max_no_cost_change):
-		crossover(population, crossover_sequence_size, crossover_child_proportion, num_parents_proportion)
-		mutate(population, mutation_num_swap, mutation_proportion)
-		population = natural_selection(population, num_cities)
+	while True:
+		scale = scheduler.next_scale()
+		if scale == 0 or (maxtime == 0 and cpt > max_no_cost_change):
+			break
+		routes, costs = generation(routes, costs, num_cities, dist, params, scale)
+		scheduler.done(scale, costs[0])
+
+		if cost_old == costs[0]:
+			cpt += 1
+		elif renderer is not None:
+			renderer.show(routes[0], costs[0])
+		if renderer is not None:
+			renderer.update()
 
-		if cost_old == population[0].cost:
+		cost_old = costs[0]
+
+	if renderer is not None:
+		renderer.flush()
+	if trace is not None:
+		trace.extend(scheduler.trace)
+
+	# cities are numbered in the order they were read, their id is their index
+	chosen_one = [cities[i] for i in routes[0]]
+	cost = dist.exact_cost(routes[0])
+	if gui:
+		draw(cities)
+		draw_itinerary("Un chemin de cout {0}".format(cost), chosen_one)
+	print("found route with cost {0}".format(cost))
+	return [cost, [city.name for city in chosen_one]]
+
+
+def export_trace(trace, filename):
+	"""Écrit la trace de ga_solve en CSV : seconds, generation, cost"""
+	with open(filename, 'w', newline='') as f:
+		writer = csv.writer(f)
+		writer.writerow(['seconds', 'generation', 'cost'])
+		writer.writerows(trace)
+
+
+def island_solve(file=None, gui=False, maxtime=0, islands=None, seed=None, vary=True):
+	"""
+	Modèle en îles : islands populations indépendantes (une par coeur par défaut), chacune dans son propre processus,
+	avec sa propre graine et, avec vary, ses propres paramètres (voir island_parameters).
+	Toutes les migration_interval générations, chaque île envoie ses num_migrants meilleurs individus à la suivante
+	(en anneau) et remplace ses plus mauvais par ceux qu'elle a reçus. Les files d'attente ne bloquent jamais : une
+	île lente ou déjà terminée ne ralentit pas les autres.
+	Même signature et même genre de résultat que ga_solve, le meilleur individu de toutes les îles.
+	Ne fonctionne qu'avec un fichier, les îles ne dessinent rien.
+	"""
+	started = time.time()  # shared by every process, unlike perf_counter
+	cities = parse_filename(file)
+	if islands is None:
+		islands = multiprocessing.cpu_count()
+	if seed is None:
+		seed = random.randrange(2 ** 32)
+
+	inboxes = [multiprocessing.Queue() for _ in range(islands)]
+	results = multiprocessing.Queue()
+	processes = []
+	for i in range(islands):
+		params = island_parameters(i, seed) if vary else parameters()
+		process = multiprocessing.Process(target=island, args=(
+			file, maxtime, started, seed + i, params, inboxes[i], inboxes[(i + 1) % islands], results))
+		process.start()
+		processes.append(process)
+
+	# islands stop island_margin before maxtime, the late ones are given up on time_margin before it
+	best = collect(results, processes, started + maxtime - time_margin if maxtime != 0 else None)
+
+	route, _, _ = min(best, key=lambda result: result[1])
+	chosen_one = [cities[i] for i in route]
+	# from the coordinates, in the order PVC-tester uses : a Distances would build its whole matrix for nothing
+	cost = localsearch.route_cost(route.tolist(), [city.x for city in cities], [city.y for city in cities])
+	if gui:
+		init_display()
+		draw(cities)
+		draw_itinerary("Un chemin de cout {0}".format(cost), chosen_one)
+	print("found route with cost {0} on {1} islands ({2} in time), {3} generations".format(
+		cost, islands, len(best), sum(result[2] for result in best)))
+	return [cost, [city.name for city in chosen_one]]
+
+
+def collect(results, processes, deadline=None):
+	"""
+	Résultats des îles de island_solve. Une île qui meurt (exception, processus tué) arrête tout avec une
+	RuntimeError au lieu de faire attendre indéfiniment. Après deadline (en secondes de time.time), on se contente des
+	îles qui ont répondu, et les autres sont arrêtées.
+	"""
+	best = []
+	try:
+		while len(best) < len(processes):
+			try:
+				best.append(results.get(timeout=0.1))
+				continue
+			except queue.Empty:
+				pass
+			dead = [process.exitcode for process in processes if process.exitcode not in (None, 0)]
+			if dead:
+				raise RuntimeError('island process exited with code {0}'.format(dead[0]))
+			if deadline is not None and time.time() > deadline:
+				if not best:
+					raise RuntimeError('no island answered in time')
+				break
+	finally:
+		for process in processes:
+			if process.is_alive() and len(best) < len(processes):
+				process.terminate()
+			process.join()
+	return best
+
+
+def island_parameters(index, seed):
+	"""Paramètres de l'île index : la première garde ceux du module, les autres en tirent des variations"""
+	if index == 0:
+		return parameters()
+	variations = random.Random(seed + index)
+	return parameters(
+		crossover_sequence_size=variations.uniform(0.2, 0.6),
+		mutation_num_swap=variations.uniform(0.05, 0.4),
+		num_parents_proportion=variations.uniform(0.01, 0.05))
+
+
+def island(file, maxtime, started, seed, params, inbox, outbox, results):
+	"""Une île de island_solve, dans son propre processus"""
+	global rng
+	random.seed(seed)
+	rng = numpy.random.default_rng(seed)
+	outbox.cancel_join_thread()  # migrants that were not received yet must not keep the process alive
+
+	# the time spent to start the process is taken from maxtime, as well as some time for the results to come back
+	deadline = time.perf_counter() + maxtime - (time.time() - started) - min(0.1 * maxtime, island_margin)
+
+	cities = parse_filename(file)
+	num_cities = len(cities)
+	dist = Distances(cities)
+	routes, costs = populate(cities, dist, params['seeding'])
+	# same scheduling as ga_solve, every generation must fit before the deadline
+	scheduler = Scheduler(time.perf_counter(), deadline if maxtime != 0 else None)
+
+	count = 0
+	cost_old = 0
+	cpt = 0
+	while True:
+		scale = scheduler.next_scale()
+		if scale == 0 or (maxtime == 0 and cpt > max_no_cost_change):
+			break
+		routes, costs = generation(routes, costs, num_cities, dist, params, scale)
+		scheduler.done(scale, costs[0])
+		count += 1
+
+		if count % migration_interval == 0:
+			outbox.put((routes[:num_migrants], costs[:num_migrants]))
+			try:
+				while True:
+					migrants, migrants_costs = inbox.get_nowait()
+					routes[-len(migrants):] = migrants
+					costs[-len(migrants):] = migrants_costs
+					routes, costs = natural_selection(routes, costs, num_cities)
+			except queue.Empty:
+				pass
+
+		if cost_old == costs[0]:
 			cpt += 1
+		cost_old = costs[0]
 
-		cost_old = population[0].cost
+	results.put((routes[0], costs[0], count))
 
-		if gui:
-			draw(cities)
-			draw_itinerary("Un chemin de cout {0}".format(population[0].cost), population[0].route)
 
-	chosen_one = heappop(population)
-	print("found route with cost {0}".format(chosen_one.cost))
-	return [chosen_one.cost, chosen_one.route]
+def benchmark_islands(file, maxtime, max_islands):
+	"""Meilleur coût et générations par seconde de island_solve, de 1 à max_islands îles, sur la même graine"""
+	for islands in range(1, max_islands + 1):
+		t0 = time.perf_counter()
+		cost, route = island_solve(file, False, maxtime, islands, seed=0)
+		print("{0} islands : cost {1:.0f} in {2:.2f}s".format(islands, cost, time.perf_counter() - t0))
+
 
+def benchmark_memetic(file, maxtime, offspring):
+	"""Coût atteint en maxtime secondes par l'algorithme génétique seul, puis avec la recherche locale"""
+	global rng
+	cities = parse_filename(file)
+	dist = Distances(cities)
+	for name, count in (('pure GA', 0), ('memetic', offspring)):
+		random.seed(0)
+		rng = numpy.random.default_rng(0)
+		params = parameters(memetic_offspring=count)
+		t0 = time.perf_counter()
+		routes, costs = populate(cities, dist, params['seeding'])
+		count = 0
+		while time.perf_counter() - t0 < maxtime:
+			routes, costs = generation(routes, costs, len(cities), dist, params)
+			count += 1
+		print("{0} : cost {1:.0f} after {2} generations in {3}s".format(
+			name, dist.exact_cost(routes[0]), count, maxtime))
+
+
+def benchmark_crossover(file, duration=5):
+	"""Enfants produits par seconde par crossover, comparé à l'ancienne méthode (crossover_one)"""
+	cities = parse_filename(file)
+	dist = Distances(cities)
+	routes, costs = populate(cities, dist)
+	num_people = len(routes)
+	num_parents = int(num_people * num_parents_proportion)
 
-def display_population(pop):
+	def reference():
+		couples = [(0, 1)] + [
+			(random.randint(0, num_people - 1), random.randint(0, num_people - 1)) for _ in range(num_parents)]
+		children = [crossover_one(routes[mom], costs[mom], routes[dad], costs[dad],
+			crossover_sequence_size, crossover_child_proportion, dist)[0] for mom, dad in couples]
+		return numpy.concatenate(children)
+
+	def linear():
+		return crossover(routes, costs, crossover_sequence_size, crossover_child_proportion, num_parents_proportion,
+			dist)[0]
+
+	for name, run in (('crossover_one', reference), ('crossover_ox', linear)):
+		offspring = 0
+		distinct = 0
+		elapsed = 0
+		while elapsed < duration:
+			t0 = time.perf_counter()
+			children = run()
+			elapsed += time.perf_counter() - t0
+			offspring += len(children)
+			distinct += len(numpy.unique(children, axis=0)) if len(children) else 0
+		print("{0} : {1:.0f} offspring/s, {2:.0f} distinct offspring/s".format(
+			name, offspring / elapsed, distinct / elapsed))
+
+
+def display_population(costs):
 	print("")
 	print("Population")
-	population = list(pop)
-	count = 0
-	while population:
-		count += 1
-		child = heappop(population)
-		print("{0} : cost {1}".format(count, child.cost))
-		# print("route :")
-		# for city in child.route:
-		# 	print("\t id : {0}".format(city.id))
-
-# ARGS PARSING
-parser = argparse.ArgumentParser(description='PVC Genetic solver')
-parser.add_argument('--nogui', default=False, action='store_true')
-parser.add_argument('--maxtime', default=0, type=int)
-parser.add_argument('filename', nargs='?', default=None)
-args = parser.parse_args()
-
-nogui, maxtime, filename = [vars(args).get(k) for k in ['nogui', 'maxtime', 'filename']]
-gui = not nogui
+	for count, cost in enumerate(costs, 1):
+		print("{0} : cost {1}".format(count, cost))
+
+def main():
+	"""Ligne de commande : python RamseyerSerex.py [options] [fichier]"""
+	global memetic_offspring, seeding_strategies, max_fps
+	parser = argparse.ArgumentParser(description='PVC Genetic solver')
+	parser.add_argument('--nogui', default=False, action='store_true')
+	parser.add_argument('--maxtime', default=0, type=int)
+	parser.add_argument('--islands', default=0, type=int, help='island model on that many processes (see island_solve)')
+	parser.add_argument('--memetic', default=0, type=int, metavar='N',
+		help='local search on the N best children of every generation (0, the plain GA, by default)')
+	parser.add_argument('--benchmark', default=False, action='store_true', help='run the benchmark of --benchmark-mode')
+	parser.add_argument('--benchmark-mode', default='crossover', choices=['crossover', 'islands', 'memetic'],
+		help='crossover (default) : offspring per second against the previous crossover, '
+		'islands : island model from 1 to --islands islands (all the cores by default) during --maxtime, '
+		'memetic : cost after --maxtime with and without local search')
+	parser.add_argument('--seeding', default=','.join(seeding_strategies),
+		help='construction heuristics of the first population, among nn, greedy, curve, insertion and random '
+		'(see populate)')
+	parser.add_argument('--fps', default=max_fps, type=int, help='most redraws per second of the best route')
+	parser.add_argument('--trace',
+		help='CSV file receiving the best cost over time (seconds, generation, cost), without --islands')
+	parser.add_argument('filename', nargs='?', default=None)
+	args = parser.parse_args()
+	if not set(args.seeding.split(',')) <= {'nn', 'greedy', 'curve', 'insertion', 'random'}:
+		parser.error('unknown seeding strategy in {0}'.format(args.seeding))
+
+	nogui, maxtime, filename, islands, memetic, benchmark = [
+		vars(args).get(k) for k in ['nogui', 'maxtime', 'filename', 'islands', 'memetic', 'benchmark']]
+	if benchmark:
+		benchmark = args.benchmark_mode
+	gui = not nogui
+	memetic_offspring = memetic
+	seeding_strategies = tuple(args.seeding.split(','))
+	max_fps = args.fps
+
+	if benchmark == 'crossover':
+		benchmark_crossover(filename)
+		return
+	elif benchmark == 'islands':
+		benchmark_islands(filename, maxtime or 10, islands or multiprocessing.cpu_count())
+		return
+	elif benchmark == 'memetic':
+		benchmark_memetic(filename, maxtime or 10, memetic or 2)
+		return
+
+	end = False
+
+	# LOOP
+	while not end:
+
+		if islands and filename:
+			cost, itinerary = island_solve(filename, gui, maxtime, islands)
+		else:
+			trace = [] if args.trace else None
+			cost, itinerary = ga_solve(filename, gui, maxtime, trace)
+			if trace is not None:
+				export_trace(trace, args.trace)
+		if gui:
+			while True:
+				event = pygame.event.wait()
+				if event.type == pygame.KEYDOWN:
+					if event.key == pygame.K_RETURN:
+						break
+					else:
+						end = True
+						break
+		else:
+			end = True
+
 
 # INIT
-child = namedtuple('child', 'cost route')
+rng = numpy.random.default_rng()
 crossover_sequence_size = 0.5
 crossover_child_proportion = 0.1
 mutation_num_swap = 0.2
 mutation_proportion = 1
 num_parents_proportion = 0.02
 max_no_cost_change = 500
+migration_interval = 50  # generations between two migrations of the island model
+num_migrants = 2
+memetic_offspring = 0  # best children improved by local search every generation, 0 for the plain GA
+candidate_neighbours = 8  # nearest cities looked at by the local search and the greedy seeding
+seeding_strategies = ('nn', 'greedy', 'curve', 'insertion')  # see populate
+seeds_per_strategy = 4
+island_margin = 0.2  # seconds kept by the islands to send their results back before maxtime
+max_matrix_cities = 4000  # bigger problems don't get a distance matrix (64MB of float32 for 4000 cities)
+max_fps = 10  # most redraws per second of the best route while solving (see Renderer)
+time_margin = 0.05  # seconds kept before maxtime to return the route (see Scheduler)
 
 screen_x = screen_y = 500
 
@@ -376,29 +944,8 @@ city_radius = 3
 
 font_color = [255, 255, 255]  # white
 
-pygame.init()
-if gui:
-	window = pygame.display.set_mode((screen_x, screen_y))
-	pygame.display.set_caption('Exemple')
-	screen = pygame.display.get_surface()
-	font = pygame.font.Font(None, 30)
-
-end = False
+pygame = screen = font = None  # see init_display
 
-# LOOP
-while not end:
 
-	cost, itinerary = ga_solve(filename, gui, maxtime)
-	if gui:
-		draw_itinerary("Un chemin de cout {0}".format(cost), itinerary)
-		while True:
-			event = pygame.event.wait()
-			if event.type == KEYDOWN:
-				if event.key == K_RETURN:
-					collecting = True
-					break
-				else:
-					end = True
-					break
-	else:
-		end = True
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,138 @@
+"""
+Deuxième solveur pour le voyageur de commerce, à comparer avec l'algorithme génétique de RamseyerSerex : une
+recherche locale itérée.
+
+La route de départ est celle du couplage glouton (voir seeding.greedy_edge), amenée à un minimum local par des chaînes
+de type Lin-Kernighan et des Or-opt (voir localsearch), sur les listes de candidats et avec les bits "don't look".
+Ensuite, tant qu'il reste du temps, un kick (localsearch.double_bridge) perturbe la meilleure route, la recherche
+locale repart des seules villes touchées, et la nouvelle route remplace l'ancienne si elle est meilleure.
+
+PVC-tester importe ga_solve de chaque module : lk_solve est aussi disponible sous ce nom.
+"""
+
+import argparse, csv, math, random, time
+import localsearch
+import seeding
+
+
+def parse_filename(filename):
+	"""Noms et coordonnées des villes du fichier, une ville par ligne (nom x y)"""
+	names, xs, ys = [], [], []
+	with open(filename, newline='') as f:
+		for name, x, y in csv.reader(f, delimiter=" "):
+			names.append(name)
+			xs.append(int(x))
+			ys.append(int(y))
+	return names, xs, ys
+
+
+class Display:
+	"""Fenêtre pygame montrant la meilleure route (pygame n'est importé que si on l'utilise)"""
+
+	def __init__(self, xs, ys):
+		import pygame
+		self.pygame = pygame
+		pygame.init()
+		self.screen = pygame.display.set_mode((screen_x, screen_y))
+		pygame.display.set_caption('Exemple')
+		self.font = pygame.font.Font(None, 30)
+		self.positions = list(zip(xs, ys))
+
+	def show(self, route, cost):
+		pygame = self.pygame
+		pygame.event.pump()
+		self.screen.fill(0)
+		for pos in self.positions:
+			pygame.draw.circle(self.screen, city_color, pos, city_radius)
+		if len(route) > 1:
+			pygame.draw.lines(self.screen, city_color, True, [self.positions[i] for i in route])
+		self.screen.blit(self.font.render("Un chemin de cout {0:.0f}".format(cost), True, font_color), (0, 0))
+		pygame.display.flip()
+
+	def wait(self):
+		"""Attend une touche ou la fermeture de la fenêtre"""
+		pygame = self.pygame
+		while pygame.event.wait().type not in (pygame.KEYDOWN, pygame.QUIT):
+			pass
+		pygame.quit()
+
+
+def lk_solve(file=None, gui=True, maxtime=0, wait=False):
+	"""
+	Même interface que RamseyerSerex.ga_solve, rend [coût, noms des villes dans l'ordre de la route].
+	Avec maxtime à 0, s'arrête après max_no_improvement kicks de suite sans amélioration.
+	Avec gui et wait, la route trouvée reste affichée jusqu'à ce qu'une touche soit pressée.
+	"""
+	if not file:
+		raise ValueError('lk_solve needs a file of cities')
+	deadline = time.perf_counter() + maxtime - min(0.05 * maxtime, margin)
+	names, xs, ys = parse_filename(file)
+	num_cities = len(names)
+	rnd = random.Random()
+
+	neighbours = seeding.neighbours(xs, ys, candidate_neighbours)
+	route = seeding.greedy_edge(xs, ys, neighbours) if num_cities > 1 else list(range(num_cities))
+	localsearch.local_search(route, xs, ys, neighbours, lk_depth=lk_depth)
+	cost = localsearch.route_cost(route, xs, ys)
+	display = Display(xs, ys) if gui else None
+	if display:
+		display.show(route, cost)
+
+	def d(a, b):
+		return math.hypot(xs[a] - xs[b], ys[a] - ys[b])
+
+	kicks = 0
+	failures = 0
+	# too few cities for two segments to swap, the local search alone is enough
+	while num_cities >= 8 and (
+			(maxtime != 0 and time.perf_counter() < deadline) or (maxtime == 0 and failures < max_no_improvement)):
+		kicked, (a, b, c, e, f, g) = localsearch.double_bridge(route, rnd, kick_length)
+		# edges (a, b), (c, e) and (f, g) became (a, e), (f, b) and (c, g)
+		kicked_cost = cost + d(a, e) + d(f, b) + d(c, g) - d(a, b) - d(c, e) - d(f, g)
+		kicked_cost -= localsearch.local_search(kicked, xs, ys, neighbours, lk_depth=lk_depth, active=(a, b, c, e, f, g))
+		kicks += 1
+		if kicked_cost < cost - 1e-9:
+			route, cost = kicked, kicked_cost
+			failures = 0
+			if display:
+				display.show(route, cost)
+		else:
+			failures += 1
+
+	# the cost is computed again in the order PVC-tester uses, without the rounding errors of the deltas
+	cost = localsearch.route_cost(route, xs, ys)
+	print("found route with cost {0} after {1} kicks".format(cost, kicks))
+	if display:
+		display.show(route, cost)
+		if wait:
+			display.wait()
+	return [cost, [names[i] for i in route]]
+
+
+# PVC-tester imports ga_solve from every module
+ga_solve = lk_solve
+
+
+# INIT
+candidate_neighbours = 8  # nearest cities looked at by the local search
+lk_depth = 3  # most 2-opt moves chained by a Lin-Kernighan move
+kick_length = 50  # longest segment moved by a kick
+max_no_improvement = 1000  # kicks in a row without improvement before stopping, when there is no maxtime
+margin = 0.1  # seconds kept before maxtime to return the route
+
+screen_x = screen_y = 500
+
+city_color = [10, 10, 200]  # blue
+city_radius = 3
+
+font_color = [255, 255, 255]  # white
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='PVC iterated Lin-Kernighan solver')
+	parser.add_argument('--nogui', default=False, action='store_true')
+	parser.add_argument('--maxtime', default=0, type=int)
+	parser.add_argument('filename')
+	args = parser.parse_args()
+
+	lk_solve(args.filename, not args.nogui, args.maxtime, wait=True)
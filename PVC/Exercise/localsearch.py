@@ -0,0 +1,242 @@
+"""
+Recherche locale pour le voyageur de commerce : 2-opt, Or-opt et chaînes de type Lin-Kernighan sur une route
+(liste d'id de villes, fermée).
+
+Tous ne regardent que les k plus proches voisins de chaque ville (listes de candidats) et utilisent des bits
+"don't look" : une ville qui n'a donné aucune amélioration n'est plus regardée tant qu'une de ses arêtes n'a pas
+changé. Une passe coûte ainsi à peu près O(n * k) au lieu de O(n²).
+"""
+
+import math
+from collections import deque
+
+
+def route_cost(route, xs, ys):
+	cost = 0
+	for i, j in zip(route, route[1:] + route[:1]):
+		cost += math.hypot(xs[j] - xs[i], ys[j] - ys[i])
+	return cost
+
+
+def reverse(route, pos, i, j):
+	"""
+	Renverse la portion de route allant de la position i à la position j (en avançant, éventuellement en faisant le
+	tour), ou le reste de la route s'il est plus court : pour une route fermée, le résultat est le même.
+	"""
+	num_cities = len(route)
+	length = (j - i) % num_cities + 1
+	if 2 * length > num_cities:
+		i, j = (j + 1) % num_cities, (i - 1) % num_cities
+		length = num_cities - length
+	for _ in range(length // 2):
+		route[i], route[j] = route[j], route[i]
+		pos[route[i]] = i
+		pos[route[j]] = j
+		i = (i + 1) % num_cities
+		j = (j - 1) % num_cities
+
+
+def local_search(route, xs, ys, neighbours, or_opt=True, max_segment=3, lk_depth=0, active=None):
+	"""
+	2-opt et Or-opt (déplacement de 1 à max_segment villes consécutives, dans un sens ou dans l'autre) jusqu'à un
+	minimum local. route est modifiée en place, rend le gain total.
+	xs et ys sont des listes de coordonnées indexées par id, neighbours les listes de candidats (voir seeding.neighbours).
+	Avec lk_depth, le 2-opt est remplacé par des chaînes de lk_depth 2-opt au plus (voir _lk_move).
+	active : les seules villes regardées au départ (toutes par défaut), par exemple celles touchées par un kick.
+	"""
+	num_cities = len(route)
+	if num_cities < 5:
+		return 0
+
+	def d(a, b):
+		return math.hypot(xs[a] - xs[b], ys[a] - ys[b])
+
+	pos = [0] * num_cities
+	for i, city in enumerate(route):
+		pos[city] = i
+	if active is None:
+		active = route
+	is_active = [False] * num_cities
+	for city in active:
+		is_active[city] = True
+	active = deque(city for city in route if is_active[city])
+	gain = 0
+
+	def wake(*cities):
+		for city in cities:
+			if not is_active[city]:
+				is_active[city] = True
+				active.append(city)
+
+	while active:
+		a = active.popleft()
+		is_active[a] = False
+		if lk_depth:
+			improved = _lk_move(a, route, pos, neighbours, d, wake, lk_depth)
+		else:
+			improved = _two_opt_move(a, route, pos, neighbours, d, wake)
+		if not improved and or_opt:
+			improved = _or_opt_move(a, route, pos, neighbours, d, wake, max_segment)
+		if improved:
+			gain += improved
+			wake(a)
+	return gain
+
+
+def _two_opt_move(a, route, pos, neighbours, d, wake):
+	"""Premier 2-opt améliorant autour de a, appliqué, rend son gain (0 si aucun)"""
+	num_cities = len(route)
+	for step in (1, -1):  # with the successor of a, then with its predecessor
+		i = pos[a]
+		b = route[(i + step) % num_cities]
+		d_ab = d(a, b)
+		for c in neighbours[a]:
+			d_ac = d(a, c)
+			if d_ac >= d_ab:  # candidates are sorted, none of the next ones can do better
+				break
+			j = pos[c]
+			e = route[(j + step) % num_cities]
+			if c == b or e == a:
+				continue
+			delta = d_ab + d(c, e) - d_ac - d(b, e)
+			if delta > 1e-9:
+				# edges (a, b) and (c, e) become (a, c) and (b, e)
+				if step == 1:
+					reverse(route, pos, (i + 1) % num_cities, j)
+				else:
+					reverse(route, pos, i, (j - 1) % num_cities)
+				wake(b, c, e)
+				return delta
+	return 0
+
+
+def _lk_move(t1, route, pos, neighbours, d, wake, max_depth, breadth=(5, 3)):
+	"""
+	Premier mouvement de type Lin-Kernighan améliorant autour de t1, appliqué, rend son gain (0 si aucun).
+	L'arête (t1, t2) est enlevée, avec t2 le successeur puis le prédécesseur de t1, et la chaîne est cherchée par
+	_lk_step.
+	"""
+	num_cities = len(route)
+	for step in (1, -1):
+		t2 = route[(pos[t1] + step) % num_cities]
+		improved = _lk_step(t1, t2, d(t1, t2), 0, route, pos, neighbours, d, wake, max_depth, breadth)
+		if improved:
+			return improved
+	return 0
+
+
+def _lk_step(t1, t2, gain, depth, route, pos, neighbours, d, wake, max_depth, breadth):
+	"""
+	Un maillon de la chaîne : l'arête (t1, t2) de la route est enlevée et gain est ce que la chaîne a gagné jusque-là
+	sans elle. On ajoute (t2, t3) pour un candidat t3 de t2, on enlève (t3, t4) et on referme par (t4, t1) : c'est un
+	2-opt, appliqué tout de suite. S'il ne suffit pas à améliorer la route, (t4, t1) est à son tour enlevée au
+	maillon suivant, jusqu'à max_depth maillons. Les breadth[depth] meilleurs t3 sont essayés (un seul au-delà), une
+	chaîne qui n'aboutit pas est défaite. Rend le gain de la chaîne appliquée, 0 si aucune.
+	"""
+	num_cities = len(route)
+	forward = route[(pos[t1] + 1) % num_cities] == t2
+	options = []
+	for t3 in neighbours[t2]:
+		partial = gain - d(t2, t3)
+		if partial <= 1e-9:  # candidates are sorted, the next ones give even less
+			break
+		if t3 == t1:
+			continue
+		# t4 is the neighbour of t3 that gives back a tour once (t4, t1) is added
+		t4 = route[(pos[t3] - 1) % num_cities] if forward else route[(pos[t3] + 1) % num_cities]
+		if t4 == t2:
+			continue
+		options.append((partial + d(t3, t4), t3, t4))
+	options.sort(reverse=True)
+
+	# a chain that can be closed right away is taken before trying longer ones, which must be applied to be followed
+	for total, t3, t4 in options:
+		closed = total - d(t4, t1)
+		if closed > 1e-9:
+			reverse(route, pos, *((pos[t2], pos[t4]) if forward else (pos[t4], pos[t2])))
+			wake(t1, t2, t3, t4)
+			return closed
+	if depth + 1 >= max_depth:
+		return 0
+
+	for total, t3, t4 in options[:breadth[depth] if depth < len(breadth) else 1]:
+		i, j = (pos[t2], pos[t4]) if forward else (pos[t4], pos[t2])
+		reverse(route, pos, i, j)
+		improved = _lk_step(t1, t4, total, depth + 1, route, pos, neighbours, d, wake, max_depth, breadth)
+		if improved:
+			wake(t1, t2, t3, t4)
+			return improved
+		reverse(route, pos, i, j)  # the same reversal again puts the route back
+	return 0
+
+
+def double_bridge(route, rng, max_length=50):
+	"""
+	Kick de la recherche locale itérée : deux portions voisines de la route, de 1 à max_length villes, commençant
+	après une ville au hasard, sont échangées (A B C D devient A C B D). Rend la route obtenue et les villes dont
+	les arêtes ont changé. rng est un random.Random.
+	"""
+	num_cities = len(route)
+	start = rng.randrange(num_cities)
+	route = route[start:] + route[:start]
+	first = rng.randint(1, max(min(max_length, (num_cities - 2) // 2), 1))
+	second = rng.randint(1, max(min(max_length, num_cities - 2 - first), 1))
+	moved = route[0], route[1], route[first], route[first + 1], route[first + second], route[
+		(first + second + 1) % num_cities]
+	return route[:1] + route[first + 1:first + second + 1] + route[1:first + 1] + route[first + second + 1:], moved
+
+
+def _or_opt_move(first, route, pos, neighbours, d, wake, max_segment):
+	"""Premier Or-opt améliorant pour un segment commençant par first, appliqué, rend son gain (0 si aucun)"""
+	num_cities = len(route)
+	i = pos[first]
+	for length in range(1, max_segment + 1):
+		if length > num_cities - 3:
+			break
+		last = route[(i + length - 1) % num_cities]
+		p = route[(i - 1) % num_cities]
+		q = route[(i + length) % num_cities]
+		removed = d(p, first) + d(last, q) - d(p, q)
+		if removed <= 1e-9:
+			continue
+		segment = set(route[(i + s) % num_cities] for s in range(length))
+
+		# the segment goes next to a candidate of one of its ends, in the order that puts that end against it
+		for end, other in ((first, last), (last, first)):
+			for c in neighbours[end]:
+				d_c = d(end, c)
+				if d_c >= removed:
+					break
+				if c in segment:
+					continue
+				# once the segment is removed, the cities around c are the ones of the tour without it
+				succ = route[(pos[c] + 1) % num_cities] if c != p else q
+				pred = route[(pos[c] - 1) % num_cities] if c != q else p
+				for neighbour in (succ, pred):
+					if neighbour in segment:
+						continue
+					delta = removed - (d_c + d(other, neighbour) - d(c, neighbour))
+					if delta > 1e-9:
+						_move_segment(route, pos, i, length, c, neighbour == succ, end == first)
+						wake(p, q, c, neighbour, first, last)
+						return delta
+	return 0
+
+
+def _move_segment(route, pos, i, length, c, after, end_first):
+	"""
+	Déplace le segment de length villes commençant à la position i à côté de c : juste après c si after, juste
+	avant sinon. end_first indique que c doit toucher la première ville du segment, la dernière sinon.
+	"""
+	num_cities = len(route)
+	indexes = [(i + s) % num_cities for s in range(length)]
+	segment = [route[s] for s in indexes]
+	removed = set(indexes)
+	rest = [route[s] for s in range(num_cities) if s not in removed]
+	# placed after c, the segment starts by the end that touches c ; placed before c, it ends with it
+	if after != end_first:
+		segment.reverse()
+	at = rest.index(c) + (1 if after else 0)
+	route[:] = rest[:at] + segment + rest[at:]
+	for position, city in enumerate(route):
+		pos[city] = position
@@ -0,0 +1,245 @@
+"""
+Heuristiques de construction pour la population de départ de l'algorithme génétique, toutes basées sur un index
+spatial (Grid) plutôt que sur des parcours de toutes les villes :
+
+	nearest_neighbour      plus proche voisin depuis une ville de départ
+	greedy_edge            les arêtes les plus courtes d'abord (parmi les k plus proches voisins), puis les
+	                       fragments obtenus sont reliés au plus proche
+	hilbert_order          ordre des villes le long d'une courbe de Hilbert, éventuellement tournée
+	randomized_insertion   insertion des villes dans un ordre aléatoire, à côté de la ville déjà insérée la plus proche
+
+Les villes sont des id de 0 à n - 1, xs et ys leurs coordonnées (listes), les routes des listes d'id.
+"""
+
+import math
+import numpy
+
+
+class Grid:
+	"""
+	Villes rangées dans des cases carrées (environ per_cell villes par case) pour trouver les plus proches d'un point
+	sans parcourir toutes les villes. On peut ajouter et enlever des villes : la taille des cases est recalculée
+	quand leur nombre a beaucoup changé, pour que les recherches restent locales.
+	"""
+
+	def __init__(self, xs, ys, ids=None, per_cell=2):
+		self.xs = xs
+		self.ys = ys
+		self.per_cell = per_cell
+		self.min_x, self.max_x = min(xs), max(xs)
+		self.min_y, self.max_y = min(ys), max(ys)
+		self._build(range(len(xs)) if ids is None else ids)
+
+	def _build(self, ids):
+		ids = list(ids)
+		width = max(self.max_x - self.min_x, 1)
+		height = max(self.max_y - self.min_y, 1)
+		self.size = math.sqrt(width * height * self.per_cell / max(len(ids), 1))
+		self.columns = int(width // self.size) + 1
+		self.rows = int(height // self.size) + 1
+		self.cells = [[] for _ in range(self.columns * self.rows)]
+		self.count = 0
+		self.built = max(len(ids), 1)
+		for i in ids:
+			self.cells[self._cell(self.xs[i], self.ys[i])].append(i)
+			self.count += 1
+
+	def _column(self, x):
+		return min(max(int((x - self.min_x) // self.size), 0), self.columns - 1)
+
+	def _row(self, y):
+		return min(max(int((y - self.min_y) // self.size), 0), self.rows - 1)
+
+	def _cell(self, x, y):
+		return self._row(y) * self.columns + self._column(x)
+
+	def ids(self):
+		return [i for cell in self.cells for i in cell]
+
+	def add(self, i):
+		self.cells[self._cell(self.xs[i], self.ys[i])].append(i)
+		self.count += 1
+		if self.count > 4 * self.built:
+			self._build(self.ids())
+
+	def remove(self, i):
+		self.cells[self._cell(self.xs[i], self.ys[i])].remove(i)
+		self.count -= 1
+		if 4 * self.count < self.built:
+			self._build(self.ids())
+
+	def nearest(self, x, y, k=1):
+		"""Les k villes les plus proches de (x, y), en (distance au carré, id) de la plus proche à la plus loin"""
+		xs, ys, cells, columns = self.xs, self.ys, self.cells, self.columns
+		column, row = self._column(x), self._row(y)
+		# cities not seen after ring r are at least r * size away, plus the distance to the grid from outside
+		outside = max(self.min_x - x, x - self.max_x, 0) ** 2 + max(self.min_y - y, y - self.max_y, 0) ** 2
+		found = []
+		ring = 0
+		max_ring = max(self.columns, self.rows)
+		while ring <= max_ring:
+			for r in range(max(row - ring, 0), min(row + ring, self.rows - 1) + 1):
+				if r == row - ring or r == row + ring:
+					ring_columns = range(max(column - ring, 0), min(column + ring, columns - 1) + 1)
+				else:
+					ring_columns = [c for c in (column - ring, column + ring) if 0 <= c < columns]
+				for c in ring_columns:
+					for i in cells[r * columns + c]:
+						found.append(((xs[i] - x) ** 2 + (ys[i] - y) ** 2, i))
+			if len(found) >= k:
+				found.sort()
+				if found[k - 1][0] <= (ring * self.size) ** 2 + outside:
+					break
+			ring += 1
+		found.sort()
+		return found[:k]
+
+
+def nearest_neighbour(xs, ys, start=0):
+	"""Route du plus proche voisin depuis start"""
+	grid = Grid(xs, ys)
+	grid.remove(start)
+	route = [start]
+	current = start
+	while grid.count:
+		current = grid.nearest(xs[current], ys[current])[0][1]
+		grid.remove(current)
+		route.append(current)
+	return route
+
+
+def neighbours(xs, ys, k):
+	"""Les k plus proches voisins de chaque ville, du plus proche au plus loin"""
+	grid = Grid(xs, ys)
+	return [[i for _, i in grid.nearest(xs[c], ys[c], k + 1) if i != c][:k] for c in range(len(xs))]
+
+
+def greedy_edge(xs, ys, candidates=None, k=10):
+	"""
+	Couplage glouton : les arêtes candidates (vers les k plus proches voisins) sont prises de la plus courte à la plus
+	longue tant qu'aucune ville n'a plus de deux voisins et qu'aucun cycle ne se forme. Les fragments qui restent
+	sont reliés en allant toujours vers l'extrémité libre la plus proche.
+	"""
+	num_cities = len(xs)
+	if candidates is None:
+		candidates = neighbours(xs, ys, k)
+	edges = sorted({(min(a, b), max(a, b)) for a in range(num_cities) for b in candidates[a]},
+		key=lambda edge: (xs[edge[0]] - xs[edge[1]]) ** 2 + (ys[edge[0]] - ys[edge[1]]) ** 2)
+
+	parent = list(range(num_cities))  # union-find of the fragments
+
+	def find(i):
+		while parent[i] != i:
+			parent[i] = parent[parent[i]]
+			i = parent[i]
+		return i
+
+	links = [[] for _ in range(num_cities)]
+	for a, b in edges:
+		if len(links[a]) < 2 and len(links[b]) < 2:
+			root_a, root_b = find(a), find(b)
+			if root_a != root_b:
+				parent[root_a] = root_b
+				links[a].append(b)
+				links[b].append(a)
+
+	# every fragment is a path, walked from one of its ends
+	fragments = []
+	fragment_of = {}
+	seen = [False] * num_cities
+	for start in range(num_cities):
+		if len(links[start]) < 2 and not seen[start]:
+			path = [start]
+			seen[start] = True
+			previous, current = None, start
+			while True:
+				following = [i for i in links[current] if i != previous]
+				if not following:
+					break
+				previous, current = current, following[0]
+				seen[current] = True
+				path.append(current)
+			fragment_of[path[0]] = fragment_of[path[-1]] = len(fragments)
+			fragments.append(path)
+
+	ends = Grid(xs, ys, fragment_of)
+	route = fragments[0]
+	for end in {route[0], route[-1]}:
+		ends.remove(end)
+	while ends.count:
+		end = ends.nearest(xs[route[-1]], ys[route[-1]])[0][1]
+		path = fragments[fragment_of[end]]
+		if path[0] != end:
+			path.reverse()
+		for i in {path[0], path[-1]}:
+			ends.remove(i)
+		route.extend(path)
+	return route
+
+
+def hilbert_order(xs, ys, rng=None, order=16):
+	"""
+	Villes dans l'ordre où une courbe de Hilbert qui couvre le plan les rencontre. Avec rng (numpy.random.Generator),
+	les villes sont tournées d'un angle aléatoire avant, ce qui donne une autre courbe.
+	"""
+	xs = numpy.asarray(xs, dtype=numpy.float64)
+	ys = numpy.asarray(ys, dtype=numpy.float64)
+	if rng is not None:
+		angle = rng.random() * 2 * math.pi
+		xs, ys = xs * math.cos(angle) - ys * math.sin(angle), xs * math.sin(angle) + ys * math.cos(angle)
+	side = 2 ** order
+	extent = max(xs.max() - xs.min(), ys.max() - ys.min(), 1) * (1 + 1e-9)
+	x = (xs - xs.min()) / extent
+	y = (ys - ys.min()) / extent
+	x = (x * side).astype(numpy.int64)
+	y = (y * side).astype(numpy.int64)
+
+	d = numpy.zeros(len(x), dtype=numpy.int64)
+	s = side // 2
+	while s > 0:
+		rx = (x & s) > 0
+		ry = (y & s) > 0
+		d += s * s * ((3 * rx) ^ ry)
+		# rotation of the quadrant
+		flip = ~ry & rx
+		x = numpy.where(flip, side - 1 - x, x)
+		y = numpy.where(flip, side - 1 - y, y)
+		x, y = numpy.where(~ry, y, x), numpy.where(~ry, x, y)
+		s //= 2
+	return numpy.argsort(d, kind='stable').tolist()
+
+
+def randomized_insertion(xs, ys, rng):
+	"""
+	Insertion des villes dans un ordre aléatoire (rng est un random.Random) : chaque ville est mise à côté de la
+	ville déjà insérée la plus proche, avant ou après, là où ça allonge le moins la route.
+	"""
+	num_cities = len(xs)
+	order = list(range(num_cities))
+	rng.shuffle(order)
+
+	def d(a, b):
+		return math.hypot(xs[a] - xs[b], ys[a] - ys[b])
+
+	first = order[0]
+	following = [0] * num_cities
+	preceding = [0] * num_cities
+	following[first] = preceding[first] = first
+	inserted = Grid(xs, ys, [first])
+	for c in order[1:]:
+		a = inserted.nearest(xs[c], ys[c])[0][1]
+		p, q = preceding[a], following[a]
+		if d(p, c) + d(c, a) - d(p, a) < d(a, c) + d(c, q) - d(a, q):
+			a, q = p, a
+		following[a] = c
+		preceding[c] = a
+		following[c] = q
+		preceding[q] = c
+		inserted.add(c)
+
+	route = [first]
+	current = following[first]
+	while current != first:
+		route.append(current)
+		current = following[current]
+	return route